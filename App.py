@@ -11,25 +11,32 @@ import re
 import shutil
 import platform
 import functools
+import threading
+import atexit
+from collections import deque, OrderedDict
 import numpy as np
 import glob
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+# Must be set before torch initializes CUDA: expandable segments let the caching allocator grow
+# instead of fragmenting while VRAM management streams DiT weights in and out (PyTorch >= 2.1).
+# Only a default - a PYTORCH_CUDA_ALLOC_CONF set by the user is kept as is - and not on Windows,
+# where the allocator doesn't support expandable segments.
+if platform.system() != "Windows":
+    os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:512")
 
 import psutil
 DEFAULT_CLEAR_CACHE = True if psutil.virtual_memory().total < 31 * 1024**3 else False
 
-import torch
+# torch, diffsynth and the prompt expanders are imported inside the functions that need them,
+# so startup and UI-only callbacks don't pay for CUDA/torch initialization
 import gradio as gr
 from PIL import Image, ImageOps
 import cv2
 
-import wan
-from wan.configs import MAX_AREA_CONFIGS, WAN_CONFIGS
-from wan.utils.prompt_extend import DashScopePromptExpander, QwenPromptExpander
-from wan.utils.utils import cache_video
-from diffsynth import ModelManager, WanVideoPipeline, save_video, VideoData
-from modelscope import snapshot_download, dataset_snapshot_download
-from video_utils import reencode_video_to_16fps, clean_temp_videos, check_video_has_audio, add_audio_to_video
+from video_utils import reencode_video_to_16fps, clean_temp_videos, check_video_has_audio, add_audio_to_video, probe_video
 from filelock import FileLock
 
 DEFAULT_OUTPUT_DIR="outputs"
@@ -73,6 +80,7 @@ def safe_save_video(video_data, filename, fps=16, quality=90):
             temp_file = filename + ".tmp"
         
         # Save the video
+        from diffsynth import save_video
         save_video(video_data, actual_filename, fps=fps, quality=quality)
         
         # Clean up the temporary reservation file if it exists
@@ -112,93 +120,98 @@ def extract_last_frame(video_path):
         return Image.fromarray(frame)
     return None
 
+def _format_duration(label, seconds, include_minutes):
+    if include_minutes:
+        return f"{label}: {seconds:.2f} seconds / {seconds/60:.2f} minutes"
+    return f"{label}: {seconds:.2f} seconds"
+
+def _input_file_line(parameters):
+    kind = "Video" if parameters.get('is_video', False) else "Image"
+    return f"Input {kind}: {parameters['input_file']}"
+
+def _denoising_line(parameters):
+    if parameters.get('is_text_to_video', False) and not parameters.get('has_input_video', False):
+        return "Denoising Strength: N/A"
+    return f"Denoising Strength: {parameters['denoising_strength']}"
+
+def _lora_line(parameters):
+    if parameters['lora_details']:
+        return f"LoRA Models: {parameters['lora_details']}"
+    return "LoRA Model: None"
+
+def _segment_detail_lines(segment_details):
+    if not isinstance(segment_details, list):
+        return []
+    return [f"Extension segment {detail[0]}: {detail[1]}" if isinstance(detail, tuple) else f"{detail}"
+            for detail in segment_details]
+
+def precision_label(torch_dtype_str):
+    return "FP8" if torch_dtype_str == "torch.float8_e4m3fn" else "BF16"
+
 def generate_prompt_info(parameters):
     """
     Generate prompt info text from parameters dict.
+    Lines are collected in a list and joined once instead of repeated string concatenation.
     """
-    details = ""
-    details += f"Prompt: {parameters['prompt']}\n"
-    details += f"Negative Prompt: {parameters['negative_prompt']}\n"
-    
-    # Add clarity for extension models
-    if 'extension_segment' in parameters and parameters['extension_segment'] > 0:
-        details += f"Used Model: {parameters['model_choice']} (Extension Model)\n"
-    else:
-        details += f"Used Model: {parameters['model_choice']}\n"
+    is_extension = parameters.get('extension_segment', 0) > 0
+    lines = [
+        f"Prompt: {parameters['prompt']}",
+        f"Negative Prompt: {parameters['negative_prompt']}",
+        f"Used Model: {parameters['model_choice']}" + (" (Extension Model)" if is_extension else ""),
+    ]
     
     if 'extension_model' in parameters:
-        details += f"Extension Model: {parameters['extension_model']}\n"
+        lines.append(f"Extension Model: {parameters['extension_model']}")
     
-    details += f"Number of Inference Steps: {parameters['inference_steps']}\n"
-    details += f"CFG Scale: {parameters['cfg_scale']}\n"
-    details += f"Sigma Shift: {parameters['sigma_shift']}\n"
-    details += f"Seed: {parameters['seed']}\n"
-    details += f"Number of Frames: {parameters['num_frames']}\n"
+    lines += [
+        f"Number of Inference Steps: {parameters['inference_steps']}",
+        f"CFG Scale: {parameters['cfg_scale']}",
+        f"Sigma Shift: {parameters['sigma_shift']}",
+        f"Seed: {parameters['seed']}",
+        f"Number of Frames: {parameters['num_frames']}",
+    ]
     
     if 'extend_factor' in parameters:
-        details += f"Extend Factor: {parameters['extend_factor']}x\n"
-    
+        lines.append(f"Extend Factor: {parameters['extend_factor']}x")
     if 'num_segments' in parameters:
-        details += f"Number of Segments: {parameters['num_segments']}\n"
-    
+        lines.append(f"Number of Segments: {parameters['num_segments']}")
     if 'extension_segment' in parameters:
-        details += f"Extension Segment: {parameters['extension_segment']} of {parameters['total_extensions']}\n"
-    
+        lines.append(f"Extension Segment: {parameters['extension_segment']} of {parameters['total_extensions']}")
     if 'source_frame' in parameters:
-        details += f"Used Last Frame From: {parameters['source_frame']}\n"
-    
+        lines.append(f"Used Last Frame From: {parameters['source_frame']}")
     if 'input_file' in parameters:
-        if parameters.get('is_video', False):
-            details += f"Input Video: {parameters['input_file']}\n"
-        else:
-            details += f"Input Image: {parameters['input_file']}\n"
-    
+        lines.append(_input_file_line(parameters))
     if 'denoising_strength' in parameters:
-        if parameters.get('is_text_to_video', False) and not parameters.get('has_input_video', False):
-            details += "Denoising Strength: N/A\n"
-        else:
-            details += f"Denoising Strength: {parameters['denoising_strength']}\n"
-    
-    if 'pr_rife_enabled' in parameters and parameters['pr_rife_enabled']:
-        details += f"Practical-RIFE: Enabled, Multiplier: {parameters.get('pr_rife_multiplier', '(unspecified)')}\n"
-    
+        lines.append(_denoising_line(parameters))
+    if parameters.get('pr_rife_enabled'):
+        lines.append(f"Practical-RIFE: Enabled, Multiplier: {parameters.get('pr_rife_multiplier', '(unspecified)')}")
     if 'segment_details' in parameters:
-        if isinstance(parameters['segment_details'], list):
-            for detail in parameters['segment_details']:
-                if isinstance(detail, tuple):
-                    i, text = detail
-                    details += f"Extension segment {i}: {text}\n"
-                else:
-                    details += f"{detail}\n"
-    
+        lines += _segment_detail_lines(parameters['segment_details'])
     if 'lora_details' in parameters:
-        if parameters['lora_details']:
-            details += f"LoRA Models: {parameters['lora_details']}\n"
-        else:
-            details += "LoRA Model: None\n"
+        lines.append(_lora_line(parameters))
     
-    details += f"TeaCache Enabled: {parameters['enable_teacache']}\n"
+    lines.append(f"TeaCache Enabled: {parameters['enable_teacache']}")
     if parameters['enable_teacache']:
-        details += f"TeaCache L1 Threshold: {parameters['tea_cache_l1_thresh']}\n"
-        details += f"TeaCache Model ID: {parameters['tea_cache_model_id']}\n"
+        lines.append(f"TeaCache L1 Threshold: {parameters['tea_cache_l1_thresh']}")
+        lines.append(f"TeaCache Model ID: {parameters['tea_cache_model_id']}")
     
-    details += f"Precision: {'FP8' if parameters['torch_dtype'] == 'torch.float8_e4m3fn' else 'BF16'}\n"
-    details += f"Auto Crop: {'Enabled' if parameters.get('auto_crop', False) else 'Disabled'}\n"
-    details += f"Final Resolution: {parameters['width']}x{parameters['height']}\n"
+    lines += [
+        f"Precision: {parameters.get('precision') or precision_label(parameters['torch_dtype'])}",
+        f"Auto Crop: {'Enabled' if parameters.get('auto_crop', False) else 'Disabled'}",
+        f"Final Resolution: {parameters['width']}x{parameters['height']}",
+    ]
     
+    include_minutes = parameters.get('include_minutes', False)
     if 'video_generation_duration' in parameters:
-        details += f"Video Generation Duration: {parameters['video_generation_duration']:.2f} seconds"
-        if parameters.get('include_minutes', False):
-            details += f" / {parameters['video_generation_duration']/60:.2f} minutes"
-        details += "\n"
-    
+        lines.append(_format_duration("Video Generation Duration", parameters['video_generation_duration'], include_minutes))
     if 'generation_duration' in parameters:
-        details += f"Total Processing Duration: {parameters['generation_duration']:.2f} seconds"
-        if parameters.get('include_minutes', False):
-            details += f" / {parameters['generation_duration']/60:.2f} minutes"
-        details += "\n"
+        lines.append(_format_duration("Total Processing Duration", parameters['generation_duration'], include_minutes))
     
-    return details
+    return "\n".join(lines) + "\n"
+
+def write_prompt_info(txt_filename, generation_details):
+    """Write a prompt info text file in one call."""
+    Path(txt_filename).write_text(generation_details, encoding="utf-8")
 
 def remove_temp_file(temp_file):
     """Safely remove a temporary file if it exists"""
@@ -209,6 +222,215 @@ def remove_temp_file(temp_file):
         except Exception as e:
             print(f"[CMD] Failed to remove temporary file {temp_file}: {e}")
 
+def start_practical_rife(input_video, output_video, multiplier):
+    """
+    Launch Practical-RIFE frame interpolation without a shell and without blocking.
+    Its output is streamed to the console line by line, prefixed with the input name, and the last
+    lines are kept on proc.output_tail for error reports.
+    Returns the subprocess.Popen handle; call wait_practical_rife() before using output_video.
+    """
+    cmd = [
+        sys.executable, os.path.join("Practical-RIFE", "inference_video.py"),
+        f"--model={os.path.abspath(os.path.join('Practical-RIFE', 'train_log'))}",
+        f"--multi={multiplier}",
+        f"--video={input_video}",
+        f"--output={output_video}",
+    ]
+    proc = subprocess.Popen(cmd, env=os.environ, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, encoding="utf-8", errors="replace", bufsize=1)
+    proc.output_tail = deque(maxlen=20)
+    proc.output_thread = threading.Thread(target=_stream_rife_output,
+                                          args=(proc, f"[RIFE {os.path.basename(input_video)}]"), daemon=True)
+    proc.output_thread.start()
+    return proc
+
+def _stream_rife_output(proc, prefix):
+    for line in proc.stdout:
+        line = line.rstrip()
+        if line:
+            print(f"{prefix} {line}")
+            proc.output_tail.append(line)
+    proc.stdout.close()
+
+def wait_practical_rife(proc, cancel_event=None):
+    """
+    Wait for a Practical-RIFE process, raising CalledProcessError on failure like subprocess.run(check=True).
+    If cancel_event gets set while waiting, the process is terminated (and so fails).
+    """
+    if cancel_event is not None:
+        while proc.poll() is None:
+            if cancel_event.wait(0.5):
+                proc.terminate()
+                break
+    returncode = proc.wait()
+    proc.output_thread.join()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, proc.args, output="\n".join(proc.output_tail))
+
+# .tmp reservations of Practical-RIFE outputs that are still being produced. cleanup_tmp_files()
+# leaves these alone, since it runs after every generation while deferred batch jobs keep going.
+_active_rife_reservations = set()
+
+# Set when a batch is cancelled so its queued Practical-RIFE runs don't start and running ones stop
+rife_cancel_event = threading.Event()
+
+def release_rife_reservation(improved_temp):
+    if improved_temp:
+        _active_rife_reservations.discard(os.path.abspath(improved_temp))
+        remove_temp_file(improved_temp)
+
+def start_rife_job(video_file, improved_name, output_dir, multiplier, max_source_fps):
+    """
+    Reserve the interpolated output name and start Practical-RIFE on video_file unless its FPS is
+    above max_source_fps. Returns (process or None if skipped, improved filename, temp file, source fps).
+    The reservation is released by finish_rife_job / cancel_rife_jobs.
+    """
+    improved, improved_temp = get_next_filename("mp4", output_dir=output_dir, custom_filename=improved_name)
+    _active_rife_reservations.add(os.path.abspath(improved_temp))
+    try:
+        probe = probe_video(video_file)
+        source_fps = probe[0] if probe is not None else 0.0
+        if source_fps > max_source_fps:
+            return None, improved, improved_temp, source_fps
+        print(f"[CMD] Applying Practical-RIFE on {video_file}")
+        return start_practical_rife(video_file, improved, multiplier), improved, improved_temp, source_fps
+    except Exception:
+        release_rife_reservation(improved_temp)
+        raise
+
+def cancel_rife_jobs(jobs):
+    """Terminate any still running Practical-RIFE processes and drop their filename reservations."""
+    for job in jobs:
+        if isinstance(job, tuple):
+            proc, _, improved_temp, _ = job
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+            release_rife_reservation(improved_temp)
+
+def finish_rife_job(job, source_video, label, readd_audio=True, temp_audio_file=None, cancel_event=None):
+    """
+    Wait for a job returned by start_rife_job and finalize it: drop the filename reservation and,
+    if readd_audio, copy the audio of source_video onto the interpolated video. Setting cancel_event
+    terminates the run.
+    Returns (video to use, log text); source_video is used when RIFE was skipped or failed.
+    """
+    log_text = ""
+    improved_temp = None
+    try:
+        if isinstance(job, Exception):
+            raise job
+        proc, improved, improved_temp, source_fps = job
+        if proc is None:
+            log_text += f"[CMD] Skipped Practical-RIFE on {label} because source FPS ({source_fps:.2f}) is above threshold.\n"
+            # Clean up unused temp file
+            release_rife_reservation(improved_temp)
+            return source_video, log_text
+        wait_practical_rife(proc, cancel_event)
+        log_text += f"[CMD] Applied Practical-RIFE on {label}. Saved as: {improved}\n"
+        # Clean up temp file after successful RIFE processing
+        release_rife_reservation(improved_temp)
+        
+        # Re-add audio after RIFE processing if the source video had audio
+        if readd_audio:
+            improved_with_audio, _ = add_audio_to_video(source_video, improved, temp_audio_file=temp_audio_file)
+            if improved_with_audio != improved:
+                improved = improved_with_audio
+                log_text += f"[CMD] Added audio back after RIFE processing on {label}: {improved}\n"
+        return improved, log_text
+    except Exception as e:
+        log_text += f"[CMD] Error applying Practical-RIFE on {label}: {str(e)}\n"
+        if isinstance(e, subprocess.CalledProcessError) and e.output:
+            log_text += f"[CMD] Practical-RIFE output:\n{e.output}\n"
+        # Clean up temp file on error
+        release_rife_reservation(improved_temp)
+        return source_video, log_text
+
+# Bounded pool for Practical-RIFE runs deferred by batch processing, so interpolation of one item
+# overlaps generation of the next. Each RIFE process needs its own GPU memory, hence the small cap;
+# --max_rife_parallel overrides it.
+MAX_RIFE_PARALLEL = max(1, min(2, (os.cpu_count() or 2) // 2))
+rife_pool = None
+
+def get_rife_pool():
+    global rife_pool
+    if rife_pool is None:
+        rife_pool = ThreadPoolExecutor(max_workers=MAX_RIFE_PARALLEL, thread_name_prefix="rife")
+    return rife_pool
+
+def run_rife_job(video_file, improved_name, output_dir, multiplier, max_source_fps, label, readd_audio=True):
+    """Start and finish one Practical-RIFE run; used as the deferred rife_pool task."""
+    if rife_cancel_event.is_set():
+        return video_file, f"[CMD] Skipped Practical-RIFE on {label}: batch processing was cancelled.\n"
+    try:
+        job = start_rife_job(video_file, improved_name, output_dir, multiplier, max_source_fps)
+    except Exception as e:
+        job = e
+    return finish_rife_job(job, video_file, label, readd_audio=readd_audio, cancel_event=rife_cancel_event)
+
+def collect_rife_futures(rife_futures):
+    """Wait for deferred Practical-RIFE runs and return their combined log text."""
+    log_text = ""
+    if rife_futures:
+        log_text += f"[CMD] Waiting for {len(rife_futures)} queued Practical-RIFE job(s) to finish...\n"
+    for future in rife_futures:
+        try:
+            _, job_log = future.result()
+            log_text += job_log
+        except Exception as e:
+            log_text += f"[CMD] Error in queued Practical-RIFE job: {str(e)}\n"
+    rife_futures.clear()
+    return log_text
+
+def cancel_rife_futures(rife_futures):
+    """
+    Stop deferred Practical-RIFE runs after a batch was cancelled: queued runs are dropped, running
+    ones are terminated. Waits for them so their reservations are released; returns their log text.
+    """
+    rife_cancel_event.set()
+    log_text = ""
+    pending = []
+    for future in rife_futures:
+        if not future.cancel():
+            pending.append(future)
+    if len(pending) < len(rife_futures):
+        log_text += f"[CMD] Dropped {len(rife_futures) - len(pending)} queued Practical-RIFE job(s).\n"
+    rife_futures[:] = pending
+    return log_text + collect_rife_futures(rife_futures)
+
+def _extend_log(log_lines, text):
+    """Add a block of newline-terminated log text to a batch log_lines list."""
+    if text:
+        log_lines.append(text.rstrip("\n"))
+
+# Small pool for PNG and prompt-info writes (and the input image decode) so disk I/O doesn't hold
+# up generation
+io_pool = None
+
+def get_io_pool():
+    global io_pool
+    if io_pool is None:
+        io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="io")
+    return io_pool
+
+def submit_io(io_futures, fn, *args, **kwargs):
+    """Run a file write on io_pool and track it in the caller's io_futures list for wait_io()."""
+    io_futures.append(get_io_pool().submit(fn, *args, **kwargs))
+
+def save_png_async(io_futures, image, filename):
+    # compress_level=1: these are reference copies, zlib's default level 6 is several times slower
+    submit_io(io_futures, image.save, filename, optimize=False, compress_level=1)
+
+def wait_io(io_futures):
+    """Wait for the file writes in io_futures and return log text for any that failed."""
+    log_text = ""
+    while io_futures:
+        future = io_futures.pop(0)
+        try:
+            future.result()
+        except Exception as e:
+            log_text += f"[CMD] Error writing file in background: {str(e)}\n"
+    return log_text
+
 # Modify the merge_videos function to use the remove_temp_file function
 def merge_videos(video_files, output_dir=DEFAULT_OUTPUT_DIR):
     """
@@ -242,15 +464,16 @@ def merge_videos(video_files, output_dir=DEFAULT_OUTPUT_DIR):
     
     # If audio is present, add proper handling with the map command to ensure all audio streams are preserved
     if has_audio:
-        cmd = f'ffmpeg -f concat -safe 0 -i "{filelist_path}" -c:v copy -c:a aac -b:a 192k -map 0:v? -map 0:a? -shortest "{merged_video_path}"'
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", filelist_path, "-c:v", "copy", "-c:a", "aac", "-b:a", "192k",
+               "-map", "0:v?", "-map", "0:a?", "-shortest", merged_video_path]
         print(f"[CMD] Merging videos with audio preservation")
     else:
-        cmd = f'ffmpeg -f concat -safe 0 -i "{filelist_path}" -c copy "{merged_video_path}"'
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", filelist_path, "-c", "copy", merged_video_path]
         print(f"[CMD] Merging videos (no audio detected)")
     
     # Run the ffmpeg command
     try:
-        result = subprocess.run(cmd, shell=True, check=True, stderr=subprocess.PIPE)
+        result = subprocess.run(cmd, check=True, stderr=subprocess.PIPE)
         print(f"[CMD] FFmpeg merge command completed successfully")
         # Clean up temp file after successful generation
         remove_temp_file(temp_file)
@@ -313,30 +536,68 @@ def get_common_file(new_path, old_path):
 
 # ------------------------- Pipeline Management Helpers -------------------------
 
-def has_model_config_changed(old_config, new_config):
-    critical_keys = ["model_choice", "torch_dtype", "num_persistent"]
-    for key in critical_keys:
-        if str(old_config.get(key)) != str(new_config.get(key)):
-            print(f"[CMD - DEBUG] Critical config change detected in {key}: {old_config.get(key)} != {new_config.get(key)}")
-            return True
-    
-    lora_keys = [
-        "lora_model", "lora_alpha",
-        "lora_model_2", "lora_alpha_2",
-        "lora_model_3", "lora_alpha_3",
-        "lora_model_4", "lora_alpha_4"
+_PIPELINE_LORA_KEYS = (
+    ("lora_model", "lora_alpha"),
+    ("lora_model_2", "lora_alpha_2"),
+    ("lora_model_3", "lora_alpha_3"),
+    ("lora_model_4", "lora_alpha_4"),
+)
+
+def _canonical_config_value(value):
+    value = "" if value is None else str(value).strip()
+    return "" if value == "None" else value
+
+def _canonical_alpha(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _canonical_config_value(value)
+
+def _pipeline_signature(config):
+    """
+    Canonical, hashable summary of the config fields that require a pipeline reload.
+    Equivalent configs (e.g. lora_alpha 0.8 vs "0.8", None vs "None" vs "") give equal signatures.
+    """
+    signature = [
+        _canonical_config_value(config.get("model_choice")),
+        _canonical_config_value(config.get("torch_dtype")),
+        _canonical_config_value(config.get("num_persistent")),
     ]
-    
-    for key in lora_keys:
-        old_val = old_config.get(key)
-        new_val = new_config.get(key)
-        if str(old_val).strip() in ["", "None"] and str(new_val).strip() in ["", "None"]:
-            continue
-        if str(old_val) != str(new_val):
-            print(f"[CMD - DEBUG] LoRA config change detected in {key}: {old_val} != {new_val}")
-            return True
+    for model_key, alpha_key in _PIPELINE_LORA_KEYS:
+        lora_model = _canonical_config_value(config.get(model_key))
+        # The alpha of an unused LoRA slot does not affect the pipeline
+        signature.append((lora_model, _canonical_alpha(config.get(alpha_key)) if lora_model else ""))
+    return tuple(signature)
+
+def has_model_config_changed(old_config, new_config):
+    old_sig = _pipeline_signature(old_config)
+    new_sig = _pipeline_signature(new_config)
+    if old_sig != new_sig:
+        print(f"[CMD - DEBUG] Pipeline config change detected: {old_sig} != {new_sig}")
+        return True
     return False
 
+def unload_pipeline():
+    """
+    Drop the resident WAN pipeline and its model manager and release cached GPU memory.
+    generate_videos keeps the pipeline loaded between generations; this is called when
+    "Clear Cache After Generation" is enabled and by the Unload Model button.
+    """
+    global loaded_pipeline, loaded_pipeline_config, model_manager
+    was_loaded = loaded_pipeline is not None
+    loaded_pipeline = None
+    loaded_pipeline_config = {}
+    if model_manager is not None and hasattr(model_manager, 'clear_models'):
+        model_manager.clear_models()
+    model_manager = None
+    gc.collect()
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    if was_loaded:
+        print("[CMD] Unloaded model pipeline.")
+    return "Model unloaded." if was_loaded else "No model is loaded."
+
 def clear_pipeline_if_needed(pipeline, pipeline_config, new_config):
     global model_manager
 
@@ -367,8 +628,10 @@ def clear_pipeline_if_needed(pipeline, pipeline_config, new_config):
 
         if model_manager is None:
             print(f"[CMD - DEBUG] Reinitializing model_manager")
+            from diffsynth import ModelManager
             model_manager = ModelManager(device="cpu")
 
+        import torch
         gc.collect()
         gc.collect()
         if torch.cuda.is_available():
@@ -822,9 +1085,39 @@ def process_random_prompt(prompt):
         return ''
     return re.sub(pattern, replacer, prompt)
 
+def image_size(image):
+    """
+    (width, height) of a PIL image, an HxWxC ndarray, or an image file path as delivered by
+    gr.Image(type="filepath"). Paths only have their header read; EXIF rotation is accounted for.
+    """
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    if isinstance(image, str):
+        with Image.open(image) as header:
+            w, h = header.size
+            # Orientations 5-8 rotate by 90 degrees
+            if header.getexif().get(0x0112) in (5, 6, 7, 8):
+                return h, w
+            return w, h
+    return image.size
+
+def as_rgb_array(image):
+    """Gradio numpy images are RGB already; grayscale or RGBA arrays are converted to RGB."""
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
+    return image
+
+def to_pil_image(image):
+    """The WAN pipeline takes PIL input images; ndarrays are converted only at that point."""
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(as_rgb_array(image))
+    return image
+
 def compute_auto_scale_dimensions(image, default_width, default_height):
     target_area = default_width * default_height
-    orig_w, orig_h = image.size
+    orig_w, orig_h = image_size(image)
     if orig_w * orig_h <= target_area:
         return orig_w, orig_h
     scale_factor = (target_area / (orig_w * orig_h)) ** 0.5
@@ -845,28 +1138,121 @@ def update_target_dimensions(image, auto_scale, current_width, current_height):
             return current_width, current_height
     return current_width, current_height
 
-def auto_crop_image(image, target_width, target_height):
-    w, h = image.size
+@functools.lru_cache(maxsize=64)
+def compute_crop_box(w, h, target_width, target_height):
+    """Centered (left, top, right, bottom) box of a w x h image matching the target aspect ratio, or None if it already matches."""
     target_ratio = target_width / target_height
     current_ratio = w / h
     if current_ratio > target_ratio:
         new_width = int(h * target_ratio)
         left = (w - new_width) // 2
-        right = left + new_width
-        image = image.crop((left, 0, right, h))
+        return (left, 0, left + new_width, h)
     elif current_ratio < target_ratio:
         new_height = int(w / target_ratio)
         top = (h - new_height) // 2
-        bottom = top + new_height
-        image = image.crop((0, top, w, bottom))
-    image = image.resize((target_width, target_height), Image.LANCZOS)
+        return (0, top, w, top + new_height)
+    return None
+
+def apply_jpeg_draft(image, target_width, target_height):
+    """
+    Ask libjpeg to decode a not yet loaded JPEG at 1/2, 1/4 or 1/8 scale, keeping both sides
+    at least twice the largest target side (so EXIF rotation and cropping never go below target).
+    Has no effect on other formats or on images that are already decoded.
+    """
+    if getattr(image, "format", None) == "JPEG" and hasattr(image, "draft"):
+        side = 2 * max(int(target_width), int(target_height))
+        image.draft("RGB", (side, side))
+    return image
+
+# Set from --gpu_image_prep; runs the single-image auto crop / auto scale on the GPU (antialiased
+# bicubic) instead of the CPU Lanczos resize
+GPU_IMAGE_PREP = False
+
+def image_prep_device():
+    import torch
+    return "cuda" if GPU_IMAGE_PREP and torch.cuda.is_available() else None
+
+def _gpu_prep_failed(e):
+    """Log a failed GPU crop/resize before the CPU fallback; an out-of-memory error also frees the cached blocks."""
+    import torch
+    print(f"[CMD] GPU crop/resize failed, falling back to CPU: {e}")
+    if isinstance(e, torch.cuda.OutOfMemoryError):
+        torch.cuda.empty_cache()
+
+def _gpu_prep(image, box, target_width, target_height, device):
+    """
+    Upload an RGB PIL image or ndarray through pinned memory and crop + antialiased bicubic resize it as one
+    torchvision kernel on `device`. Returns a uint8 CHW tensor on `device`.
+    """
+    import torch
+    from torchvision.transforms.v2 import functional as TF
+    w, h = image_size(image)
+    left, top, right, bottom = box if box is not None else (0, 0, w, h)
+    tensor = torch.from_numpy(np.ascontiguousarray(image))
+    if torch.device(device).type == "cuda":
+        tensor = tensor.pin_memory()
+    tensor = tensor.to(device, non_blocking=True).permute(2, 0, 1)
+    return TF.resized_crop(tensor, top, left, bottom - top, right - left, [target_height, target_width],
+                           interpolation=TF.InterpolationMode.BICUBIC, antialias=True)
+
+def gpu_crop_resize(image, box, target_width, target_height, device):
+    """
+    Crop + resize of an RGB PIL image or ndarray on `device` via _gpu_prep.
+    Returns a PIL image because the WAN pipeline resizes and normalizes its input_image itself.
+    """
+    tensor = _gpu_prep(image, box, target_width, target_height, device)
+    return Image.fromarray(tensor.permute(1, 2, 0).cpu().numpy())
+
+def crop_resize_array(image, target_width, target_height, device=None, interpolation=None):
+    """
+    auto_crop_image for HxWx3 uint8 arrays (any channel order): the crop is a slice (no copy) and the
+    resize is cv2 (interpolation if given, else INTER_AREA when shrinking and Lanczos when enlarging),
+    or one GPU kernel with device.
+    """
+    h, w = image.shape[:2]
+    if (w, h) == (target_width, target_height):
+        return image
+    box = compute_crop_box(w, h, target_width, target_height)
+    if device is not None:
+        try:
+            tensor = _gpu_prep(image, box, target_width, target_height, device)
+            return tensor.permute(1, 2, 0).cpu().numpy()
+        except Exception as e:
+            _gpu_prep_failed(e)
+    if box is not None:
+        left, top, right, bottom = box
+        image = image[top:bottom, left:right]
+    if image.shape[1] != target_width or image.shape[0] != target_height:
+        if interpolation is None:
+            downscale = image.shape[1] >= target_width and image.shape[0] >= target_height
+            interpolation = cv2.INTER_AREA if downscale else cv2.INTER_LANCZOS4
+        image = cv2.resize(image, (target_width, target_height), interpolation=interpolation)
+    return image
+
+def auto_crop_image(image, target_width, target_height, resample=Image.LANCZOS, device=None):
+    """Center-crop and resize a PIL image or RGB ndarray to the target size; returns a PIL image."""
+    if isinstance(image, np.ndarray):
+        interpolation = cv2.INTER_LANCZOS4 if resample == Image.LANCZOS else None
+        return to_pil_image(crop_resize_array(as_rgb_array(image), target_width, target_height, device, interpolation))
+    if image.size == (target_width, target_height):
+        return image
+    image = apply_jpeg_draft(image, target_width, target_height)
+    box = compute_crop_box(image.size[0], image.size[1], target_width, target_height)
+    if device is not None and image.mode == "RGB":
+        try:
+            return gpu_crop_resize(image, box, target_width, target_height, device)
+        except Exception as e:
+            _gpu_prep_failed(e)
+    if box is not None:
+        image = image.crop(box)
+    image = image.resize((target_width, target_height), resample)
     return image
 
-def auto_scale_image(image, target_width, target_height):
+def auto_scale_image(image, target_width, target_height, device=None):
     target_area = target_width * target_height
-    orig_w, orig_h = image.size
+    orig_w, orig_h = image_size(image)
     if orig_w * orig_h <= target_area:
-        return image
+        return to_pil_image(image)
     scale_factor = (target_area / (orig_w * orig_h)) ** 0.5
     new_w = int(orig_w * scale_factor)
     new_h = int(orig_h * scale_factor)
@@ -874,6 +1260,15 @@ def auto_scale_image(image, target_width, target_height):
     new_h = (new_h // 16) * 16
     new_w = max(new_w, 16)
     new_h = max(new_h, 16)
+    if isinstance(image, np.ndarray):
+        image = as_rgb_array(image)
+    if device is not None and (isinstance(image, np.ndarray) or image.mode == "RGB"):
+        try:
+            return gpu_crop_resize(image, None, new_w, new_h, device)
+        except Exception as e:
+            _gpu_prep_failed(e)
+    if isinstance(image, np.ndarray):
+        return to_pil_image(cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LANCZOS4))
     return image.resize((new_w, new_h), Image.LANCZOS)
 
 def toggle_lora_visibility(current_visibility):
@@ -881,17 +1276,6 @@ def toggle_lora_visibility(current_visibility):
     new_label = "Hide More LoRAs" if new_visibility else "Show More LoRAs"
     return gr.update(visible=new_visibility), new_visibility, new_label
 
-def update_tea_cache_model_id(model_choice):
-    if model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)":
-        return "Wan2.1-T2V-1.3B"
-    elif model_choice == "WAN 2.1 14B Text-to-Video":
-        return "Wan2.1-T2V-14B"
-    elif model_choice == "WAN 2.1 14B Image-to-Video 720P":
-        return "Wan2.1-I2V-14B-720P"
-    elif model_choice == "WAN 2.1 14B Image-to-Video 480P":
-        return "Wan2.1-I2V-14B-480P"
-    return "Wan2.1-T2V-1.3B"
-
 ASPECT_RATIOS_1_3b = {
     "1:1":  (640, 640),
     "4:3":  (736, 544),
@@ -922,207 +1306,97 @@ ASPECT_RATIOS_14b = {
     "5:4":  (1072, 864),
 }
 
+# Short model keys used by the lookup tables below (and by load_wan_pipeline).
+# Unknown model names map to None, which selects the generic 14B fallback entries.
+_MODEL_SLUG = {
+    "WAN 2.1 1.3B (Text/Video-to-Video)": "1.3B",
+    "WAN 2.1 14B Text-to-Video": "14B_text",
+    "WAN 2.1 14B Image-to-Video 720P": "14B_image_720p",
+    "WAN 2.1 14B Image-to-Video 480P": "14B_image_480p",
+}
+
+_TEA_CACHE_MODEL_IDS = {
+    "1.3B": "Wan2.1-T2V-1.3B",
+    "14B_text": "Wan2.1-T2V-14B",
+    "14B_image_720p": "Wan2.1-I2V-14B-720P",
+    "14B_image_480p": "Wan2.1-I2V-14B-480P",
+    None: "Wan2.1-T2V-1.3B",
+}
+
+_RESOLUTION_MAPS = {
+    "1.3B": ASPECT_RATIOS_1_3b,
+    "14B_text": ASPECT_RATIOS_14b,
+    "14B_image_720p": ASPECT_RATIOS_14b,
+    "14B_image_480p": ASPECT_RATIOS_1_3b,
+    None: ASPECT_RATIOS_14b,
+}
+
+def _vram_map(*values):
+    return dict(zip(("4GB", "6GB", "8GB", "10GB", "12GB", "16GB", "24GB", "32GB", "48GB", "80GB"), values))
+
+_VRAM_MAPS_1_3B = _vram_map("0", "500,000,000", "7,000,000,000", "7,000,000,000", "7,000,000,000",
+                            "7,000,000,000", "7,000,000,000", "7,000,000,000", "7,000,000,000", "7,000,000,000")
+
+# num_persistent_param_in_dit per VRAM preset, keyed by torch_dtype then model slug
+_VRAM_MAPS = {
+    "torch.float8_e4m3fn": {
+        "1.3B": _VRAM_MAPS_1_3B,
+        "14B_text": _vram_map("0", "0", "0", "0", "0", "0",
+                              "8,750,000,000", "22,000,000,000", "22,000,000,000", "22,000,000,000"),
+        "14B_image_720p": _vram_map("0", "0", "0", "0", "0", "0",
+                                    "6,000,000,000", "14,000,000,000", "22,000,000,000", "22,000,000,000"),
+        "14B_image_480p": _vram_map("0", "0", "0", "0", "2,500,000,000", "7,500,000,000",
+                                    "15,000,000,000", "22,000,000,000", "22,000,000,000", "22,000,000,000"),
+        None: _vram_map("0", "0", "0", "0", "0", "0",
+                        "3,000,000,000", "6,500,000,000", "16,000,000,000", "22,000,000,000"),
+    },
+    "torch.bfloat16": {
+        "1.3B": _VRAM_MAPS_1_3B,
+        "14B_text": _vram_map("0", "0", "0", "0", "0", "0",
+                              "4,250,000,000", "6,500,000,000", "22,000,000,000", "22,000,000,000"),
+        "14B_image_720p": _vram_map("0", "0", "0", "0", "0", "0",
+                                    "3,000,000,000", "5,500,000,000", "14,500,000,000", "22,000,000,000"),
+        "14B_image_480p": _vram_map("0", "0", "0", "0", "1,500,000,000", "3,500,000,000",
+                                    "7,000,000,000", "10,500,000,000", "22,000,000,000", "22,000,000,000"),
+        None: _vram_map("0", "0", "0", "0", "0", "0",
+                        "3,000,000,000", "5,500,000,000", "16,000,000,000", "22,000,000,000"),
+    },
+}
+
+def update_tea_cache_model_id(model_choice):
+    return _TEA_CACHE_MODEL_IDS[_MODEL_SLUG.get(model_choice)]
+
 def update_vram_and_resolution(model_choice, preset, torch_dtype):
     print(model_choice)
-    if torch_dtype == "torch.float8_e4m3fn":
-        if model_choice == "WAN 2.1 14B Text-to-Video":
-            mapping = {
-                "4GB": "0",
-                "6GB": "0",
-                "8GB": "0",
-                "10GB": "0",
-                "12GB": "0",
-                "16GB": "0",
-                "24GB": "8,750,000,000",
-                "32GB": "22,000,000,000",
-                "48GB": "22,000,000,000",
-                "80GB": "22,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_14b.keys())
-            default_aspect = "16:9"
-        elif model_choice == "WAN 2.1 14B Image-to-Video 720P":
-            mapping = {
-                "4GB": "0",
-                "6GB": "0",
-                "8GB": "0",
-                "10GB": "0",
-                "12GB": "0",
-                "16GB": "0",
-                "24GB": "6,000,000,000",
-                "32GB": "14,000,000,000",
-                "48GB": "22,000,000,000",
-                "80GB": "22,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_14b.keys())
-            default_aspect = "16:9"
-        elif model_choice == "WAN 2.1 14B Image-to-Video 480P":
-            mapping = {
-                "4GB": "0",
-                "6GB": "0",
-                "8GB": "0",
-                "10GB": "0",
-                "12GB": "2,500,000,000",
-                "16GB": "7,500,000,000",
-                "24GB": "15,000,000,000",
-                "32GB": "22,000,000,000",
-                "48GB": "22,000,000,000",
-                "80GB": "22,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_1_3b.keys())
-            default_aspect = "16:9"
-        else:
-            if model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)":
-                mapping = {
-                    "4GB": "0",
-                    "6GB": "500,000,000",
-                    "8GB": "7,000,000,000",
-                    "10GB": "7,000,000,000",
-                    "12GB": "7,000,000,000",
-                    "16GB": "7,000,000,000",
-                    "24GB": "7,000,000,000",
-                    "32GB": "7,000,000,000",
-                    "48GB": "7,000,000,000",
-                    "80GB": "7,000,000,000"
-                }
-                resolution_choices = list(ASPECT_RATIOS_1_3b.keys())
-                default_aspect = "16:9"
-            else:
-                mapping = {
-                    "4GB": "0",
-                    "6GB": "0",
-                    "8GB": "0",
-                    "10GB": "0",
-                    "12GB": "0",
-                    "16GB": "0",
-                    "24GB": "3,000,000,000",
-                    "32GB": "6,500,000,000",
-                    "48GB": "16,000,000,000",
-                    "80GB": "22,000,000,000"
-                }
-                resolution_choices = list(ASPECT_RATIOS_14b.keys())
-                default_aspect = "16:9"
-        return mapping.get(preset, "12000000000"), resolution_choices, default_aspect
-    else:
-        if model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)":
-            mapping = {
-                "4GB": "0",
-                "6GB": "500,000,000",
-                "8GB": "7,000,000,000",
-                "10GB": "7,000,000,000",
-                "12GB": "7,000,000,000",
-                "16GB": "7,000,000,000",
-                "24GB": "7,000,000,000",
-                "32GB": "7,000,000,000",
-                "48GB": "7,000,000,000",
-                "80GB": "7,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_1_3b.keys())
-            default_aspect = "16:9"
-        elif model_choice == "WAN 2.1 14B Text-to-Video":
-            mapping = {
-                "4GB": "0",
-                "6GB": "0",
-                "8GB": "0",
-                "10GB": "0",
-                "12GB": "0",
-                "16GB": "0",
-                "24GB": "4,250,000,000",
-                "32GB": "6,500,000,000",
-                "48GB": "22,000,000,000",
-                "80GB": "22,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_14b.keys())
-            default_aspect = "16:9"
-        elif model_choice == "WAN 2.1 14B Image-to-Video 720P":
-            mapping = {
-                "4GB": "0",
-                "6GB": "0",
-                "8GB": "0",
-                "10GB": "0",
-                "12GB": "0",
-                "16GB": "0",
-                "24GB": "3,000,000,000",
-                "32GB": "5,500,000,000",
-                "48GB": "14,500,000,000",
-                "80GB": "22,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_14b.keys())
-            default_aspect = "16:9"
-        elif model_choice == "WAN 2.1 14B Image-to-Video 480P":
-            mapping = {
-                "4GB": "0",
-                "6GB": "0",
-                "8GB": "0",
-                "10GB": "0",
-                "12GB": "1,500,000,000",
-                "16GB": "3,500,000,000",
-                "24GB": "7,000,000,000",
-                "32GB": "10,500,000,000",
-                "48GB": "22,000,000,000",
-                "80GB": "22,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_1_3b.keys())
-            default_aspect = "16:9"
-        else:
-            mapping = {
-                "4GB": "0",
-                "6GB": "0",
-                "8GB": "0",
-                "10GB": "0",
-                "12GB": "0",
-                "16GB": "0",
-                "24GB": "3,000,000,000",
-                "32GB": "5,500,000,000",
-                "48GB": "16,000,000,000",
-                "80GB": "22,000,000,000"
-            }
-            resolution_choices = list(ASPECT_RATIOS_14b.keys())
-            default_aspect = "16:9"
-        return mapping.get(preset, "12000000000"), resolution_choices, default_aspect
+    slug = _MODEL_SLUG.get(model_choice)
+    # Every dtype other than FP8 uses the BF16 table, as before
+    vram_maps = _VRAM_MAPS.get(torch_dtype, _VRAM_MAPS["torch.bfloat16"])
+    return vram_maps[slug].get(preset, "12000000000"), list(_RESOLUTION_MAPS[slug]), "16:9"
+
+def _resolve_aspect_ratio(aspect_ratio, aspect_ratios, default_aspect="16:9"):
+    """
+    Map an aspect ratio onto one valid for aspect_ratios: "_low" variants fall back to their
+    base ratio when the model does not offer them, anything else unknown falls back to default_aspect.
+    """
+    if aspect_ratio in aspect_ratios:
+        return aspect_ratio
+    if aspect_ratio and "_low" in aspect_ratio:
+        base_aspect = aspect_ratio.split("_")[0]
+        if base_aspect in aspect_ratios:
+            return base_aspect
+    return default_aspect
 
 def update_model_settings(model_choice, current_vram_preset, torch_dtype):
     global last_selected_aspect_ratio
     
     num_persistent_val, aspect_options, default_aspect = update_vram_and_resolution(model_choice, current_vram_preset, torch_dtype)
+    aspect_ratios = _RESOLUTION_MAPS[_MODEL_SLUG.get(model_choice)]
     
+    # Preserve the last chosen aspect ratio across model switches; "_low" variants only exist
+    # for the 14B models, so they fall back to their base ratio on the 1.3B-sized models
     aspect_to_use = last_selected_aspect_ratio if last_selected_aspect_ratio else default_aspect
-    
-    # The issue is here - we need to preserve the low aspect ratio even when switching models
-    # If the aspect ratio includes "_low" suffix, we should try to find the base aspect ratio
-    if aspect_to_use and "_low" in aspect_to_use:
-        base_aspect = aspect_to_use.split("_")[0]  # Extract base aspect ratio without "_low"
-        
-        # If switching to 1.3B model from 14B with a low aspect ratio
-        if (model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)" or model_choice == "WAN 2.1 14B Image-to-Video 480P"):
-            # Check if base aspect exists in 1.3B options
-            if base_aspect in ASPECT_RATIOS_1_3b:
-                aspect_to_use = base_aspect
-            else:
-                aspect_to_use = default_aspect
-        # Keep the "_low" version when using 14B models
-        else:
-            # If the low variant isn't in choices, fall back to base aspect
-            if aspect_to_use not in ASPECT_RATIOS_14b:
-                if base_aspect in ASPECT_RATIOS_14b:
-                    aspect_to_use = base_aspect
-                else:
-                    aspect_to_use = default_aspect
-    else:
-        # Original logic for non-low aspect ratios
-        if (model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)" or model_choice == "WAN 2.1 14B Image-to-Video 480P"):
-            if aspect_to_use not in ASPECT_RATIOS_1_3b:
-                aspect_to_use = default_aspect
-            default_width, default_height = ASPECT_RATIOS_1_3b.get(aspect_to_use, (832, 480))
-        else:
-            if aspect_to_use not in ASPECT_RATIOS_14b:
-                aspect_to_use = default_aspect
-            default_width, default_height = ASPECT_RATIOS_14b.get(aspect_to_use, (1280, 720))
-    
-    # Get width and height based on selected aspect ratio
-    if (model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)" or model_choice == "WAN 2.1 14B Image-to-Video 480P"):
-        default_width, default_height = ASPECT_RATIOS_1_3b.get(aspect_to_use, (832, 480))
-    else:
-        default_width, default_height = ASPECT_RATIOS_14b.get(aspect_to_use, (1280, 720))
+    aspect_to_use = _resolve_aspect_ratio(aspect_to_use, aspect_ratios, default_aspect)
+    default_width, default_height = aspect_ratios.get(aspect_to_use, aspect_ratios["16:9"])
     
     return (
         gr.update(choices=aspect_options, value=aspect_to_use),
@@ -1133,36 +1407,12 @@ def update_model_settings(model_choice, current_vram_preset, torch_dtype):
 
 def update_width_height(aspect_ratio, model_choice):
     global last_selected_aspect_ratio
-    if model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)" or model_choice == "WAN 2.1 14B Image-to-Video 480P":
-        # For 1.3B models, we need to remove "_low" suffix if present, since it's only valid for 14B models
-        if aspect_ratio and "_low" in aspect_ratio:
-            base_aspect = aspect_ratio.split("_")[0]
-            if base_aspect in ASPECT_RATIOS_1_3b:
-                aspect_ratio = base_aspect
-            else:
-                aspect_ratio = "16:9"  # fallback
-        elif aspect_ratio not in ASPECT_RATIOS_1_3b:
-            aspect_ratio = "16:9"  # fallback to default if invalid for 1.3B
-    else:
-        # For 14B models, preserve the low aspect ratio if it exists
-        if aspect_ratio not in ASPECT_RATIOS_14b:
-            # If it has "_low" suffix but not in dictionary
-            if aspect_ratio and "_low" in aspect_ratio:
-                base_aspect = aspect_ratio.split("_")[0]
-                if base_aspect in ASPECT_RATIOS_14b:
-                    aspect_ratio = base_aspect
-                else:
-                    aspect_ratio = "16:9"  # fallback
-            else:
-                aspect_ratio = "16:9"  # fallback
+    aspect_ratios = _RESOLUTION_MAPS[_MODEL_SLUG.get(model_choice)]
+    aspect_ratio = _resolve_aspect_ratio(aspect_ratio, aspect_ratios)
     
     last_selected_aspect_ratio = aspect_ratio
     
-    if model_choice == "WAN 2.1 1.3B (Text/Video-to-Video)" or model_choice == "WAN 2.1 14B Image-to-Video 480P":
-        default_width, default_height = ASPECT_RATIOS_1_3b.get(aspect_ratio, (832, 480))
-    else:
-        default_width, default_height = ASPECT_RATIOS_14b.get(aspect_ratio, (1280, 720))
-    
+    default_width, default_height = aspect_ratios.get(aspect_ratio, aspect_ratios["16:9"])
     return default_width, default_height
 
 def update_vram_on_change(preset, model_choice):
@@ -1173,6 +1423,7 @@ def update_vram_on_change(preset, model_choice):
 def prompt_enc(prompt, tar_lang):
     global prompt_expander, loaded_pipeline, loaded_pipeline_config, args
     if prompt_expander is None:
+        from wan.utils.prompt_extend import DashScopePromptExpander, QwenPromptExpander
         if args.prompt_extend_method == "dashscope":
             prompt_expander = DashScopePromptExpander(model_name=args.prompt_extend_model, is_vl=False)
         elif args.prompt_extend_method == "local_qwen":
@@ -1236,7 +1487,51 @@ def get_next_generation_number(output_folder):
         time.sleep(random.uniform(0.01, 0.05))
         return max_num + 1
 
-def generate_videos(
+def _input_image_source(input_image, target_width, target_height, auto_crop):
+    """
+    The image generate_videos works from. An uploaded file path (gr.Image(type="filepath")) is decoded
+    on io_pool and returned as a Future, so the decode overlaps pipeline loading; it is resolved just
+    before the image is needed. Only an image that will be auto-cropped to the target size may be
+    decoded at reduced JPEG scale. Gradio numpy inputs are never modified in place, so only PIL images are copied.
+    """
+    if isinstance(input_image, str):
+        return get_io_pool().submit(_open_and_prepare, input_image, target_width, target_height, False,
+                                    reduced_decode=auto_crop)
+    if isinstance(input_image, np.ndarray):
+        return input_image
+    return input_image.copy()
+
+def generate_videos(*args, **kwargs):
+    """
+    Generate videos (see _generate_videos), wait for the file writes it queued on io_pool (also on
+    early returns and errors) and then finish the Practical-RIFE runs it left running.
+    Without extensions nothing in a generation needs the interpolated video, so outside batch mode
+    each run is only waited on here, after all generations, and overlaps the generations after it.
+    """
+    pending_rife_jobs = []
+    # File writes queued by this call only; concurrent Gradio events each wait on their own
+    io_futures = []
+    try:
+        video, log_text, seed = _generate_videos(*args, pending_rife_jobs=pending_rife_jobs,
+                                                 io_futures=io_futures, **kwargs)
+    except BaseException:
+        cancel_rife_jobs([job for job, _, _ in pending_rife_jobs])
+        raise
+    finally:
+        io_log = wait_io(io_futures)
+    log_text += io_log
+    if cancel_flag:
+        cancel_rife_jobs([job for job, _, _ in pending_rife_jobs])
+        return video, log_text, seed
+    for job, source_video, readd_audio in pending_rife_jobs:
+        # The temp audio file is gone by now, so audio is taken from the saved video itself
+        improved, rife_log = finish_rife_job(job, source_video, "original", readd_audio=readd_audio)
+        log_text += rife_log
+        if source_video == video and os.path.exists(improved):
+            video = improved
+    return video, log_text, seed
+
+def _generate_videos(
     prompt, tar_lang, negative_prompt, input_image, input_video, denoising_strength, num_generations,
     save_prompt, multi_line, use_random_seed, seed_input, quality, fps,
     model_choice_radio, vram_preset, num_persistent_input, torch_dtype, num_frames,
@@ -1250,15 +1545,21 @@ def generate_videos(
     clear_cache_after_gen, extend_factor,
     override_input_file=None,
     output_dir_override=DEFAULT_OUTPUT_DIR,
-    custom_output_filename=None
+    custom_output_filename=None,
+    rife_futures=None,
+    pending_rife_jobs=None,
+    io_futures=None
 ):
     global loaded_pipeline, loaded_pipeline_config, cancel_flag, prompt_expander
+    import torch
+    from diffsynth import VideoData
+    if io_futures is None:
+        io_futures = []
 
     output_folder = output_dir_override
     print(f"[DEBUG] Inside generate_videos: output_folder immediately after assignment = {output_folder}") # Add this line again
 
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
         
     if input_image is None and input_video is None and override_input_file is not None:
         ext = os.path.splitext(override_input_file)[1].lower()
@@ -1266,7 +1567,7 @@ def generate_videos(
             input_video = override_input_file
         else:
             try:
-                loaded_img = Image.open(override_input_file)
+                loaded_img = apply_jpeg_draft(Image.open(override_input_file), width, height)
                 loaded_img = ImageOps.exif_transpose(loaded_img)
                 input_image = loaded_img.convert("RGB")
             except Exception as e:
@@ -1311,7 +1612,7 @@ def generate_videos(
                 ]
                 
                 log_text += f"[CMD] Extracting audio with command: {' '.join(extract_cmd)}\n"
-                result = subprocess.run(' '.join(extract_cmd), shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                result = subprocess.run(extract_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
                 
                 # Verify the audio file was created successfully
                 if os.path.exists(temp_audio_file) and os.path.getsize(temp_audio_file) > 0:
@@ -1324,20 +1625,10 @@ def generate_videos(
         
         # Note: We'll re-encode the video later after effective_num_frames is defined
 
-    if model_choice_radio == "WAN 2.1 1.3B (Text/Video-to-Video)":
-        model_choice = "1.3B"
-        d = ASPECT_RATIOS_1_3b
-    elif model_choice_radio == "WAN 2.1 14B Text-to-Video":
-        model_choice = "14B_text"
-        d = ASPECT_RATIOS_14b
-    elif model_choice_radio == "WAN 2.1 14B Image-to-Video 720P":
-        model_choice = "14B_image_720p"
-        d = ASPECT_RATIOS_14b
-    elif model_choice_radio == "WAN 2.1 14B Image-to-Video 480P":
-        model_choice = "14B_image_480p"
-        d = ASPECT_RATIOS_1_3b
-    else:
+    model_choice = _MODEL_SLUG.get(model_choice_radio)
+    if model_choice is None:
         return None, "Invalid model choice.", ""
+    d = _RESOLUTION_MAPS[model_choice]
     
     target_width = int(width)
     target_height = int(height)
@@ -1350,39 +1641,28 @@ def generate_videos(
                 if original_image is None:
                     err_msg = "[CMD] Error: Could not extract image from provided video. Please upload a valid input image."
                     if clear_cache_after_gen:
-                        loaded_pipeline = None
-                        loaded_pipeline_config = {}
-                        gc.collect()
-                        if torch.cuda.is_available():
-                            torch.cuda.empty_cache()
+                        unload_pipeline()
                     return None, err_msg, str(last_used_seed or "")
                 log_text += "[CMD] Extracted last frame from input video for image-to-video generation.\n"
             else:
                 err_msg = "[CMD] Error: Image model selected but no image provided. Please upload input image."
                 if clear_cache_after_gen:
-                    loaded_pipeline = None
-                    loaded_pipeline_config = {}
-                    gc.collect()
-                    if torch.cuda.is_available():
-                        torch.cuda.empty_cache()
+                    unload_pipeline()
                 return None, err_msg, str(last_used_seed or "")
         else:
-            original_image = input_image.copy()
-    elif auto_crop or auto_scale:
-        if input_image is not None:
-            original_image = input_image.copy()
-        else:
-            original_image = None
+            original_image = _input_image_source(input_image, target_width, target_height, auto_crop)
+    else:
+        # Only the image-to-video models use the input image; nothing to decode for the others
+        original_image = None
 
     # Define effective_num_frames before any potential re-encoding
     effective_num_frames = int(num_frames)
     
     if model_choice == "1.3B" and input_video is not None:
         original_video_path = input_video if isinstance(input_video, str) else input_video.name
-        cap = cv2.VideoCapture(original_video_path)
-        if cap.isOpened():
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps_value = cap.get(cv2.CAP_PROP_FPS)
+        probe = probe_video(original_video_path)
+        if probe is not None:
+            fps_value, video_width, video_height, total_frames = probe
             effective_num_frames = min(int(num_frames), total_frames)
             print(f"[CMD] Detected input video frame count: {total_frames}, using effective frame count: {effective_num_frames}")
             
@@ -1397,7 +1677,8 @@ def generate_videos(
                 # Import here to avoid circular imports
                 from video_utils import reencode_video_to_16fps
                 
-                reencoded_video = reencode_video_to_16fps(orig_video_path, effective_num_frames, target_width=target_width, target_height=target_height)
+                reencoded_video = reencode_video_to_16fps(orig_video_path, effective_num_frames, target_width=target_width, target_height=target_height,
+                                                          orig_fps=fps_value, orig_w=video_width, orig_h=video_height, orig_frame_count=total_frames)
                 if reencoded_video != orig_video_path:
                     log_text += f"[CMD] Re-encoded input video to 16 FPS: {reencoded_video}\n"
                     # Update the input_video to use the re-encoded version
@@ -1405,7 +1686,6 @@ def generate_videos(
         else:
             effective_num_frames = int(num_frames)
             print("[CMD] Could not open input video, using provided frame count")
-        cap.release()
     else:
         effective_num_frames = int(num_frames)
 
@@ -1451,22 +1731,80 @@ def generate_videos(
     else:
         counter = get_next_generation_number(output_folder)
     
+    # All random seeds for this call are drawn up front in one vectorized call
+    rng = np.random.default_rng()
     if use_random_seed:
         base_seed = None
+        random_seeds = rng.integers(0, 2**32, size=total_iterations, dtype=np.uint32)
     else:
         try:
-            base_seed = int(seed_input.strip()) if seed_input.strip() != "" else random.randint(0, 2**32 - 1)
+            base_seed = int(seed_input.strip()) if seed_input.strip() != "" else int(rng.integers(0, 2**32, dtype=np.uint32))
         except:
-            base_seed = random.randint(0, 2**32 - 1)
+            base_seed = int(rng.integers(0, 2**32, dtype=np.uint32))
+
+    if pr_rife_enabled:
+        multiplier_val = "2" if pr_rife_radio == "2x FPS" else "4"
+        rife_suffix = f"_{multiplier_val}xFPS"
+    # Batch processing passes rife_futures to run Practical-RIFE on the bounded rife_pool after this call
+    # returns. Only done without extensions, where nothing here needs the interpolated video.
+    defer_rife = pr_rife_enabled and rife_futures is not None and int(extend_factor) <= 1
+    # Otherwise, without extensions, the runs are handed to generate_videos through pending_rife_jobs
+    # and finished after the generation loop
+    finish_rife_later = (pr_rife_enabled and not defer_rife and pending_rife_jobs is not None
+                         and int(extend_factor) <= 1)
+
+    # Working folders are created once here instead of being checked on every generation
+    pre_processed_dir = "auto_pre_processed_images"
+    if model_choice in ("14B_image_720p", "14B_image_480p"):
+        os.makedirs(pre_processed_dir, exist_ok=True)
+    used_folder = "used_last_frames"
+    if int(extend_factor) > 1:
+        os.makedirs(used_folder, exist_ok=True)
+
+    # Pipeline arguments that are the same for every generation; the loop only adds prompt and seed
+    base_args = {
+        "negative_prompt": negative_prompt,
+        "num_inference_steps": int(inference_steps),
+        "tiled": tiled,
+        "width": target_width,
+        "height": target_height,
+        "num_frames": effective_num_frames,
+        "cfg_scale": cfg_scale,
+        "sigma_shift": sigma_shift,
+        "tea_cache_l1_thresh": tea_cache_l1_thresh if enable_teacache else None,
+        "tea_cache_model_id": tea_cache_model_id if enable_teacache else "",
+    }
+    # Prompt info fields that don't change between generations; each save adds the varying ones
+    prompt_info_base = {
+        "negative_prompt": negative_prompt,
+        "inference_steps": inference_steps,
+        "cfg_scale": cfg_scale,
+        "sigma_shift": sigma_shift,
+        "extend_factor": extend_factor,
+        "num_segments": 1,
+        "input_file": orig_video_path if input_was_video else "",
+        "is_video": input_was_video,
+        "has_input_video": input_was_video,
+        "denoising_strength": denoising_strength,
+        "is_text_to_video": model_choice == "14B_text",
+        "lora_details": [f"{os.path.basename(path)} (scale {alpha})" for path, alpha in effective_loras],
+        "enable_teacache": enable_teacache,
+        "tea_cache_l1_thresh": tea_cache_l1_thresh,
+        "tea_cache_model_id": tea_cache_model_id,
+        "torch_dtype": torch_dtype,
+        "precision": precision_label(torch_dtype),
+        "auto_crop": auto_crop,
+        "include_minutes": True,
+    }
 
-    for p in prompts_list:
+    for prompt_index, p in enumerate(prompts_list):
         for gen in range(int(num_generations)):
             if cancel_flag:
                 log_text += "[CMD] Generation cancelled by user before starting a new video.\n"
                 return None, log_text, str(last_used_seed or "")
                 
             if use_random_seed:
-                current_seed = random.randint(0, 2**32 - 1)
+                current_seed = int(random_seeds[prompt_index * int(num_generations) + gen])
             else:
                 current_seed = base_seed + gen if int(num_generations) > 1 else base_seed
             last_used_seed = current_seed
@@ -1480,43 +1818,14 @@ def generate_videos(
 
             log_text += f"[CMD] Generation with prompt: {p} and seed: {current_seed}\n"
 
-            base_config = {
-                "model_choice": model_choice,
-                "torch_dtype": torch_dtype,
-                "num_persistent": str(vram_value),
-                "lora_model": lora_model,
-                "lora_alpha": format_alpha(lora_alpha) if lora_model != "None" else "None",
-                "lora_model_2": lora_model_2,
-                "lora_alpha_2": format_alpha(lora_alpha_2) if lora_model_2 != "None" else "None",
-                "lora_model_3": lora_model_3,
-                "lora_alpha_3": format_alpha(lora_alpha_slider_3) if lora_model_3 != "None" else "None",
-                "lora_model_4": lora_model_4,
-                "lora_alpha_4": format_alpha(lora_alpha_4) if lora_model_4 != "None" else "None"
-            }
-            if loaded_pipeline is None or loaded_pipeline_config.get("model_choice") != model_choice:
-                loaded_pipeline, loaded_pipeline_config = clear_pipeline_if_needed(loaded_pipeline, loaded_pipeline_config, base_config)
+            # Reload only if the pipeline was cleared or switched to the extension model
+            if loaded_pipeline is None or _pipeline_signature(loaded_pipeline_config) != _pipeline_signature(new_config):
+                loaded_pipeline, loaded_pipeline_config = clear_pipeline_if_needed(loaded_pipeline, loaded_pipeline_config, new_config)
                 if loaded_pipeline is None:
                     loaded_pipeline = load_wan_pipeline(model_choice, torch_dtype, vram_value, lora_path=effective_loras, lora_alpha=None)
-                    loaded_pipeline_config = base_config
-
-            common_args = {
-                "prompt": process_random_prompt(p),
-                "negative_prompt": negative_prompt,
-                "num_inference_steps": int(inference_steps),
-                "seed": current_seed,
-                "tiled": tiled,
-                "width": target_width,
-                "height": target_height,
-                "num_frames": effective_num_frames,
-                "cfg_scale": cfg_scale,
-                "sigma_shift": sigma_shift,
-            }
-            if enable_teacache:
-                common_args["tea_cache_l1_thresh"] = tea_cache_l1_thresh
-                common_args["tea_cache_model_id"] = tea_cache_model_id
-            else:
-                common_args["tea_cache_l1_thresh"] = None
-                common_args["tea_cache_model_id"] = ""
+                    loaded_pipeline_config = new_config
+
+            common_args = {**base_args, "prompt": process_random_prompt(p), "seed": current_seed}
             
             # Get the original filename with atomic file generation
             original_filename, original_temp_file = get_next_filename("mp4", output_dir=output_folder, 
@@ -1543,20 +1852,28 @@ def generate_videos(
                     cancel_fn=lambda: cancel_flag
                 )
             elif model_choice in ["14B_image_720p", "14B_image_480p"]:
+                if isinstance(original_image, Future):
+                    # Decoded on io_pool while the pipeline was loading
+                    try:
+                        original_image = original_image.result()
+                    except Exception as e:
+                        err_msg = f"[CMD] Error: Could not load input image {input_image}: {e}"
+                        if clear_cache_after_gen:
+                            unload_pipeline()
+                        return None, log_text + err_msg, str(last_used_seed or "")
                 if auto_crop:
-                    processed_image = auto_crop_image(original_image, target_width, target_height)
+                    processed_image = auto_crop_image(original_image, target_width, target_height,
+                                                      device=image_prep_device())
                 elif auto_scale:
-                    processed_image = auto_scale_image(original_image, target_width, target_height)
+                    processed_image = auto_scale_image(original_image, target_width, target_height,
+                                                       device=image_prep_device())
                 else:
-                    processed_image = original_image
+                    processed_image = to_pil_image(original_image)
 
-                pre_processed_dir = "auto_pre_processed_images"
-                if not os.path.exists(pre_processed_dir):
-                    os.makedirs(pre_processed_dir)
                 save_filename = os.path.join(pre_processed_dir, f"auto_processed_{int(time.time())}.png")
                 try:
-                    processed_image.save(save_filename)
-                    print(f"[CMD] Auto processed image saved to: {save_filename}")
+                    save_png_async(io_futures, processed_image, save_filename)
+                    print(f"[CMD] Auto processed image queued for saving to: {save_filename}")
                 except Exception as e:
                     print(f"[CMD] Failed to save auto processed image: {e}")
 
@@ -1570,11 +1887,7 @@ def generate_videos(
                 # Clean up any temporary file before exiting with error
                 remove_temp_file(original_temp_file)
                 if clear_cache_after_gen:
-                    loaded_pipeline = None
-                    loaded_pipeline_config = {}
-                    gc.collect()
-                    if torch.cuda.is_available():
-                        torch.cuda.empty_cache()
+                    unload_pipeline()
                 return None, err_msg, str(last_used_seed or "")
 
             video_duration = time.time() - video_start_time
@@ -1598,41 +1911,31 @@ def generate_videos(
                     original_filename = original_filename_with_audio
                     log_text += f"[CMD] Added audio to video: {original_filename}\n"
             
+            # Start Practical-RIFE now so it runs while prompt info is written and extensions are generated
+            original_rife_job = None
+            if pr_rife_enabled and not defer_rife and not cancel_flag:
+                try:
+                    original_rife_job = start_rife_job(original_filename, f"{base_name}{rife_suffix}", output_folder, multiplier_val, 125)
+                except Exception as e:
+                    original_rife_job = e
+            
             if save_prompt:
                 txt_filename = os.path.splitext(original_filename)[0] + ".txt"
                 generation_details = generate_prompt_info({
+                    **prompt_info_base,
                     "prompt": p,
-                    "negative_prompt": negative_prompt,
                     "model_choice": model_choice_radio,
-                    "inference_steps": inference_steps,
-                    "cfg_scale": cfg_scale,
-                    "sigma_shift": sigma_shift,
                     "seed": current_seed,
                     "num_frames": effective_num_frames,
-                    "extend_factor": extend_factor,
-                    "num_segments": 1,
                     "extension_segment": 0,
                     "total_extensions": int(extend_factor) - 1,
                     "source_frame": "original",
-                    "input_file": orig_video_path if input_was_video else "",
-                    "is_video": input_was_video,
-                    "has_input_video": input_was_video,
-                    "denoising_strength": denoising_strength,
-                    "is_text_to_video": model_choice == "14B_text",
-                    "lora_details": [f"{os.path.basename(path)} (scale {alpha})" for path, alpha in effective_loras],
-                    "enable_teacache": enable_teacache,
-                    "tea_cache_l1_thresh": tea_cache_l1_thresh,
-                    "tea_cache_model_id": tea_cache_model_id,
-                    "torch_dtype": torch_dtype,
-                    "auto_crop": auto_crop,
                     "width": target_width,
                     "height": target_height,
                     "video_generation_duration": video_duration,
                     "generation_duration": time.time() - overall_start_time,
-                    "include_minutes": True
                 })
-                with open(txt_filename, "w", encoding="utf-8") as f:
-                    f.write(generation_details)
+                submit_io(io_futures, write_prompt_info, txt_filename, generation_details)
                 log_text += f"[CMD] Saved prompt info for original video: {txt_filename}\n"
             
             # Only switch the pipeline to extension mode if extend_factor > 1
@@ -1654,6 +1957,7 @@ def generate_videos(
             original_improved = None
             ext_segments = []
             ext_segments_improved = []
+            ext_rife_jobs = []
             
             additional_extensions = int(extend_factor) - 1
             prev_video = original_filename
@@ -1665,31 +1969,18 @@ def generate_videos(
                 if last_frame is None:
                     log_text += f"[CMD] Failed to extract last frame for extension {ext_iter} from {prev_video}.\n"
                     break
-                used_folder = "used_last_frames"
-                if not os.path.exists(used_folder):
-                    os.makedirs(used_folder)
                 last_frame_filename = os.path.join(used_folder, f"{base_name}_ext{ext_iter}_lastframe.png")
-                last_frame.save(last_frame_filename)
+                save_png_async(io_futures, last_frame, last_frame_filename)
                 log_text += f"[CMD] Saved last frame used for extension {ext_iter}: {last_frame_filename}\n"
                 new_width, new_height = last_frame.size
                 common_args_ext = {
+                    **base_args,
                     "prompt": process_random_prompt(p),
-                    "negative_prompt": negative_prompt,
-                    "num_inference_steps": int(inference_steps),
-                    "seed": random.randint(0, 2**32 - 1) if use_random_seed else (current_seed),
-                    "tiled": tiled,
+                    "seed": int(rng.integers(0, 2**32, dtype=np.uint32)) if use_random_seed else (current_seed),
                     "width": new_width,
                     "height": new_height,
                     "num_frames": int(num_frames),
-                    "cfg_scale": cfg_scale,
-                    "sigma_shift": sigma_shift,
                 }
-                if enable_teacache:
-                    common_args_ext["tea_cache_l1_thresh"] = tea_cache_l1_thresh
-                    common_args_ext["tea_cache_model_id"] = tea_cache_model_id
-                else:
-                    common_args_ext["tea_cache_l1_thresh"] = None
-                    common_args_ext["tea_cache_model_id"] = ""
                     
                 # Get extension filename with atomic file generation - MODIFIED NAME
                 ext_file_prefix = f"{base_name}_ext{ext_iter}_original" # Changed suffix
@@ -1732,149 +2023,64 @@ def generate_videos(
                     if save_prompt:
                         txt_filename_ext = os.path.splitext(extension_filename)[0] + ".txt"
                         generation_details_ext = generate_prompt_info({
+                            **prompt_info_base,
                             "prompt": p,
-                            "negative_prompt": negative_prompt,
                             "model_choice": extension_model_choice if int(extend_factor) > 1 else model_choice_radio,
                             "extension_model": extension_model_choice if int(extend_factor) > 1 and extension_model_choice != model_choice_radio else None,
-                            "inference_steps": inference_steps,
-                            "cfg_scale": cfg_scale,
-                            "sigma_shift": sigma_shift,
                             "seed": common_args_ext["seed"],
                             "num_frames": num_frames,
-                            "extend_factor": extend_factor,
-                            "num_segments": 1,
                             "extension_segment": ext_iter,
                             "total_extensions": additional_extensions,
                             "source_frame": os.path.basename(prev_video),
-                            "input_file": orig_video_path if input_was_video else "",
-                            "is_video": input_was_video,
-                            "has_input_video": input_was_video,
-                            "denoising_strength": denoising_strength,
-                            "is_text_to_video": model_choice=="14B_text",
-                            "lora_details": [f"{os.path.basename(path)} (scale {alpha})" for path, alpha in effective_loras],
-                            "enable_teacache": enable_teacache,
-                            "tea_cache_l1_thresh": tea_cache_l1_thresh,
-                            "tea_cache_model_id": tea_cache_model_id,
-                            "torch_dtype": torch_dtype,
-                            "auto_crop": auto_crop,
                             "width": new_width,
                             "height": new_height,
                             "video_generation_duration": ext_duration,
                             "generation_duration": time.time() - overall_start_time,
-                            "include_minutes": True
                         })
-                        with open(txt_filename_ext, "w", encoding="utf-8") as f:
-                            f.write(generation_details_ext)
+                        submit_io(io_futures, write_prompt_info, txt_filename_ext, generation_details_ext)
                         log_text += f"[CMD] Saved prompt info for extension segment {ext_iter}: {txt_filename_ext}\n"
                     ext_segments.append(extension_filename)
                     prev_video = extension_filename
+                    
+                    if pr_rife_enabled and not cancel_flag:
+                        # MODIFIED NAME for RIFE extension output
+                        ext_improved_name = f"{base_name}_ext{ext_iter}_original{rife_suffix}"
+                        try:
+                            ext_rife_jobs.append(start_rife_job(extension_filename, ext_improved_name, output_folder, multiplier_val, 29))
+                        except Exception as e:
+                            ext_rife_jobs.append(e)
                 except Exception as e:
                     log_text += f"[CMD] Error during extension generation: {str(e)}\n"
                     continue
             
             if cancel_flag:
                 log_text += "[CMD] Generation cancelled by user, skipping post-processing steps.\n"
+                cancel_rife_jobs([original_rife_job] + ext_rife_jobs)
                 if clear_cache_after_gen:
-                    loaded_pipeline = None
-                    loaded_pipeline_config = {}
-                    gc.collect()
-                    if torch.cuda.is_available():
-                        torch.cuda.empty_cache()
+                    unload_pipeline()
                 return original_filename, log_text, str(last_used_seed or "")
                 
-            if pr_rife_enabled:
-                if cancel_flag:
-                    log_text += "[CMD] Generation cancelled by user before Practical-RIFE processing.\n"
-                else:
-                    # Determine RIFE suffix before getting the filename
-                    multiplier_val = "2" if pr_rife_radio == "2x FPS" else "4"
-                    rife_suffix = f"_{multiplier_val}xFPS"
-                    
-                    # Use base_name and the RIFE suffix for the improved filename
-                    original_improved_name = f"{base_name}{rife_suffix}"
-                    original_improved, original_improved_temp = get_next_filename("mp4", output_dir=output_folder, custom_filename=original_improved_name)
-                    
-                    try:
-                        cap = cv2.VideoCapture(original_filename)
-                        source_fps = cap.get(cv2.CAP_PROP_FPS)
-                        cap.release()
-                        if source_fps <= 125:
-                            print(f"[CMD] Applying Practical-RIFE on original {original_filename}")
-                            # Multiplier already determined above
-                            cmd = f'"{sys.executable}" "Practical-RIFE/inference_video.py" --model="{os.path.abspath(os.path.join("Practical-RIFE", "train_log"))}" --multi={multiplier_val} --video="{original_filename}" --output="{original_improved}"'
-                            if not cancel_flag:
-                                subprocess.run(cmd, shell=True, check=True, env=os.environ)
-                                log_text += f"[CMD] Applied Practical-RIFE on original. Saved as: {original_improved}\n"
-                                # Clean up temp file after successful RIFE processing
-                                remove_temp_file(original_improved_temp)
-                                
-                                # Re-add audio after RIFE processing if the original video had audio
-                                if input_was_video and orig_video_path:
-                                    original_improved_with_audio, _ = add_audio_to_video(original_filename, original_improved, temp_audio_file=temp_audio_file)
-                                    if original_improved_with_audio != original_improved:
-                                        original_improved = original_improved_with_audio
-                                        log_text += f"[CMD] Added audio back after RIFE processing: {original_improved}\n"
-                            else:
-                                log_text += "[CMD] Generation cancelled by user during Practical-RIFE processing.\n"
-                                original_improved = original_filename
-                                # Clean up temp file if cancelled
-                                remove_temp_file(original_improved_temp)
-                        else:
-                            original_improved = original_filename
-                            log_text += f"[CMD] Skipped Practical-RIFE on original because source FPS ({source_fps:.2f}) is above threshold.\n"
-                            # Clean up unused temp file
-                            remove_temp_file(original_improved_temp)
-                    except Exception as e:
-                        log_text += f"[CMD] Error applying Practical-RIFE on original: {str(e)}\n"
-                        original_improved = original_filename
-                        # Clean up temp file on error
-                        remove_temp_file(original_improved_temp)
-                    
-                    for idx, ext_file in enumerate(ext_segments):
-                        if cancel_flag:
-                            log_text += f"[CMD] Generation cancelled by user before Practical-RIFE processing on extension {idx+1}.\n"
-                            ext_segments_improved.append(ext_file)
-                            continue
-                            
-                        # MODIFIED NAME for RIFE extension output
-                        ext_improved_name = f"{base_name}_ext{idx+1}_original{rife_suffix}" # Changed name format
-                        ext_improved, ext_improved_temp = get_next_filename("mp4", output_dir=output_folder, custom_filename=ext_improved_name)
-                        try:
-                            cap = cv2.VideoCapture(ext_file)
-                            source_fps = cap.get(cv2.CAP_PROP_FPS)
-                            cap.release()
-                            if source_fps <= 29:
-                                print(f"[CMD] Applying Practical-RIFE on extension {ext_file}")
-                                # Multiplier already determined above
-                                cmd = f'"{sys.executable}" "Practical-RIFE/inference_video.py" --model="{os.path.abspath(os.path.join("Practical-RIFE", "train_log"))}" --multi={multiplier_val} --video="{ext_file}" --output="{ext_improved}"'
-                                if not cancel_flag:
-                                    subprocess.run(cmd, shell=True, check=True, env=os.environ)
-                                    log_text += f"[CMD] Applied Practical-RIFE on extension {idx+1}. Saved as: {ext_improved}\n"
-                                    # Clean up temp file after successful RIFE processing
-                                    remove_temp_file(ext_improved_temp)
-                                    
-                                    # Re-add audio after RIFE processing if the original extension had audio
-                                    ext_improved_with_audio, _ = add_audio_to_video(ext_file, ext_improved, temp_audio_file=temp_audio_file)
-                                    if ext_improved_with_audio != ext_improved:
-                                        ext_improved = ext_improved_with_audio
-                                        log_text += f"[CMD] Added audio back after RIFE processing on extension {idx+1}: {ext_improved}\n"
-                                
-                                else:
-                                    log_text += f"[CMD] Generation cancelled by user during Practical-RIFE processing on extension {idx+1}.\n"
-                                    ext_improved = ext_file
-                                    # Clean up temp file if cancelled
-                                    remove_temp_file(ext_improved_temp)
-                            else:
-                                ext_improved = ext_file
-                                log_text += f"[CMD] Skipped Practical-RIFE on extension {idx+1} due to high FPS.\n"
-                                # Clean up unused temp file
-                                remove_temp_file(ext_improved_temp)
-                        except Exception as e:
-                            log_text += f"[CMD] Error applying Practical-RIFE on extension {idx+1}: {str(e)}\n"
-                            ext_improved = ext_file
-                            # Clean up temp file on error
-                            remove_temp_file(ext_improved_temp)
-                        ext_segments_improved.append(ext_improved)
+            if defer_rife:
+                # The interpolated video becomes available once the queued job finishes; the temp audio
+                # file may be cleaned up before then, so the audio is taken from the saved video itself
+                rife_futures.append(get_rife_pool().submit(
+                    run_rife_job, original_filename, f"{base_name}{rife_suffix}", output_folder, multiplier_val, 125,
+                    "original", input_was_video and orig_video_path is not None))
+                log_text += f"[CMD] Queued Practical-RIFE on original: {original_filename}\n"
+                original_improved = original_filename
+            elif finish_rife_later:
+                pending_rife_jobs.append((original_rife_job, original_filename, bool(input_was_video and orig_video_path)))
+                original_improved = original_filename
+            elif pr_rife_enabled:
+                original_improved, rife_log = finish_rife_job(original_rife_job, original_filename, "original",
+                                                              readd_audio=bool(input_was_video and orig_video_path),
+                                                              temp_audio_file=temp_audio_file)
+                log_text += rife_log
+                
+                for idx, (ext_file, ext_job) in enumerate(zip(ext_segments, ext_rife_jobs)):
+                    ext_improved, rife_log = finish_rife_job(ext_job, ext_file, f"extension {idx+1}", temp_audio_file=temp_audio_file)
+                    log_text += rife_log
+                    ext_segments_improved.append(ext_improved)
             else:
                 original_improved = original_filename
 
@@ -1894,8 +2100,8 @@ def generate_videos(
                             else:
                                 log_text += f"[CMD] Warning: file not found: {vf}\n"
                     if os.path.getsize(filelist_path) > 0 and not cancel_flag:
-                        cmd = f'ffmpeg -f concat -safe 0 -i "{filelist_path}" -c copy "{merged_original}"'
-                        subprocess.run(cmd, shell=True, check=True)
+                        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", filelist_path, "-c", "copy", merged_original]
+                        subprocess.run(cmd, check=True)
                         # Clean up temp file after successful merge
                         remove_temp_file(merged_original_temp)
                         os.remove(filelist_path)
@@ -1937,8 +2143,8 @@ def generate_videos(
                                 else:
                                     log_text += f"[CMD] Warning: file not found: {vf}\n"
                         if os.path.getsize(filelist_path) > 0 and not cancel_flag:
-                            cmd = f'ffmpeg -f concat -safe 0 -i "{filelist_path}" -c copy "{merged_enhanced}"'
-                            subprocess.run(cmd, shell=True, check=True)
+                            cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", filelist_path, "-c", "copy", merged_enhanced]
+                            subprocess.run(cmd, check=True)
                             # Clean up temp file after successful merge
                             remove_temp_file(merged_enhanced_temp)
                             os.remove(filelist_path)
@@ -1977,13 +2183,6 @@ def generate_videos(
                 final_output_video = original_filename
 
             log_text += f"[CMD] Completed generation for base {base_name}.\n"
-            
-            if clear_cache_after_gen:
-                loaded_pipeline = None
-                loaded_pipeline_config = {}
-                gc.collect()
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
     
     overall_duration = time.time() - overall_start_time
     log_text += f"\n[CMD] Used VRAM Setting: {vram_value}\n"
@@ -1994,11 +2193,7 @@ def generate_videos(
     clean_temp_videos()
     
     if clear_cache_after_gen:
-        loaded_pipeline = None
-        loaded_pipeline_config = {}
-        gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+        unload_pipeline()
     
     if final_output_video and os.path.exists(final_output_video):
         return final_output_video, log_text, str(last_used_seed or "")
@@ -2016,6 +2211,99 @@ def cancel_generation():
 
 # ------------------------- Improved Batch Processing -------------------------
 
+_BATCH_INPUT_EXTS = frozenset({".jpg", ".png", ".jpeg", ".mp4", ".webp", ".bmp"})
+# How many items ahead of the current batch item are prepared in the background
+_BATCH_PREFETCH_LOOKAHEAD = 2
+# Prefetched re-encodes live in a subfolder so the clean_temp_videos() call after each item keeps them
+_BATCH_PREFETCH_VIDEO_DIR = os.path.join("auto_pre_processed_videos", "batch_prefetch")
+# Between batch items the CUDA cache is released at most every N items, and only when this much
+# reserved-but-unused memory has built up
+_BATCH_CACHE_CLEAR_INTERVAL = 8
+_BATCH_CACHE_CLEAR_SLACK = 2 * 1024**3
+
+def expandable_segments_active():
+    """
+    Whether the CUDA caching allocator actually runs with expandable segments: it must be the native
+    allocator (not cudaMallocAsync), not on Windows where the option is ignored, and the last
+    expandable_segments entry of PYTORCH_CUDA_ALLOC_CONF (read when CUDA initialized) must be True.
+    """
+    if platform.system() == "Windows":
+        return False
+    import torch
+    get_backend = getattr(torch.cuda, "get_allocator_backend", None)
+    if get_backend is not None and get_backend() != "native":
+        return False
+    enabled = False
+    for option in os.environ.get("PYTORCH_CUDA_ALLOC_CONF", "").split(","):
+        key, _, value = option.partition(":")
+        if key.strip() == "expandable_segments":
+            enabled = value.strip() == "True"
+    return enabled
+
+def maybe_release_cuda_cache(items_since_clear):
+    """
+    Release cached CUDA blocks between batch items when fragmentation has grown, instead of paying
+    a device sync after every item. With expandable segments in effect the allocator grows and
+    shrinks its segments itself, so nothing is done. Returns (items_since_clear, log text).
+    """
+    if items_since_clear < _BATCH_CACHE_CLEAR_INTERVAL:
+        return items_since_clear, ""
+    import torch
+    if not torch.cuda.is_available() or expandable_segments_active():
+        return items_since_clear, ""
+    slack = torch.cuda.memory_reserved() - torch.cuda.memory_allocated()
+    if slack <= _BATCH_CACHE_CLEAR_SLACK:
+        return items_since_clear, ""
+    reserved_before = torch.cuda.memory_reserved()
+    gc.collect()
+    torch.cuda.empty_cache()
+    freed = reserved_before - torch.cuda.memory_reserved()
+    return 0, f"[CMD] Released {freed / 1024**3:.2f} GB of cached CUDA memory after {items_since_clear} batch items.\n"
+
+def load_batch_image(file_path, width, height):
+    """Open a batch input image with Pillow and return it EXIF-transposed and converted to RGB."""
+    loaded_img = apply_jpeg_draft(Image.open(file_path), width, height)
+    loaded_img = ImageOps.exif_transpose(loaded_img)
+    return loaded_img.convert("RGB")
+
+def _open_and_prepare(file_path, width, height, auto_crop, reduced_decode=None):
+    """
+    Decode a batch input image with OpenCV (SIMD decode and resize) and, if auto_crop is set,
+    center-crop and resize it to width x height already here, so generate_videos gets an image of
+    the target size. When reduced_decode is set (default: auto_crop, where the output size is fixed
+    by width x height) JPEGs are decoded at 1/2, 1/4 or 1/8 scale when that stays above twice the
+    target size; otherwise the full resolution is kept so auto scale computes the same size as
+    update_target_dimensions. Returns an RGB ndarray for generate_videos (a PIL image from
+    load_batch_image if OpenCV can't decode it).
+    """
+    width, height = int(width), int(height)
+    if reduced_decode is None:
+        reduced_decode = auto_crop
+    flags = cv2.IMREAD_COLOR
+    if reduced_decode:
+        try:
+            with Image.open(file_path) as header:
+                src_w, src_h, src_format = header.size[0], header.size[1], header.format
+        except Exception as e:
+            # Formats only OpenCV reads; decode at full resolution
+            print(f"[CMD] Could not read image header of {file_path}: {e}")
+            src_format = None
+        if src_format == "JPEG":
+            for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                if min(src_w, src_h) // factor >= 2 * max(width, height):
+                    flags = reduced_flag
+                    break
+    # imdecode(np.fromfile) instead of imread so non-ASCII Windows paths work; EXIF orientation is applied
+    image = cv2.imdecode(np.fromfile(file_path, dtype=np.uint8), flags)
+    if image is None:
+        print(f"[CMD] OpenCV could not decode {file_path}, using Pillow")
+        image = load_batch_image(file_path, width, height)
+        return auto_crop_image(image, width, height) if auto_crop else image
+    
+    if auto_crop:
+        image = crop_resize_array(image, width, height)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
 def batch_process_videos(
     default_prompt, folder_path, batch_output_folder, skip_overwrite, tar_lang, negative_prompt, denoising_strength,
     use_random_seed, seed_input, quality, fps, model_choice_radio, vram_preset, num_persistent_input,
@@ -2027,131 +2315,206 @@ def batch_process_videos(
     global cancel_batch_flag, cancel_flag
     cancel_batch_flag = False
     cancel_flag = False
-    log_text = ""
+    # Log lines are collected in a list and joined once on return; repeated += would copy the
+    # whole log on every line of a long batch
+    log_lines = []
     if not os.path.isdir(folder_path):
-        log_text += f"[CMD] Provided folder path does not exist: {folder_path}\n"
-        return log_text
+        log_lines.append(f"[CMD] Provided folder path does not exist: {folder_path}")
+        return "\n".join(log_lines)
     if not os.path.exists(batch_output_folder):
         try:
             os.makedirs(batch_output_folder)
-            log_text += f"[CMD] Created batch processing outputs folder: {batch_output_folder}\n"
+            log_lines.append(f"[CMD] Created batch processing outputs folder: {batch_output_folder}")
         except Exception as e:
-            log_text += f"[CMD] Error creating output folder {batch_output_folder}: {e}\n"
-            return log_text
-    files_unsorted = os.listdir(folder_path)
-    # Sort files using natural sort key
-    files_unsorted.sort(key=alphanum_key)
-
-    allowed_exts = [".jpg", ".png", ".jpeg", ".mp4", ".webp"]
-    # Filter *after* sorting to maintain order of allowed files
-    files = [f for f in files_unsorted if os.path.splitext(f)[1].lower() in allowed_exts]
+            log_lines.append(f"[CMD] Error creating output folder {batch_output_folder}: {e}")
+            return "\n".join(log_lines)
+    # scandir gives the entry type without a stat call; filter first, then natural-sort only the inputs.
+    # Prompt .txt names are collected in the same pass, keyed case-insensitively (foo.TXT counts,
+    # as it would on Windows), so each item's lookup is a dict membership test.
+    files = []
+    txt_names = {}
+    with os.scandir(folder_path) as entries:
+        for e in entries:
+            if not e.is_file():
+                continue
+            ext = os.path.splitext(e.name)[1].lower()
+            if ext in _BATCH_INPUT_EXTS:
+                files.append(e.name)
+            elif ext == ".txt":
+                txt_names[e.name.lower()] = e.name
+    files.sort(key=alphanum_key)
     total_files = len(files)
-    log_text += f"[CMD] Found {total_files} files in folder {folder_path} (sorted naturally)\\n"
-    for file in files:
-        if cancel_batch_flag:
-            log_text += "[CMD] Batch processing cancelled by user.\\n"
-            return log_text
+    log_lines.append(f"[CMD] Found {total_files} files in folder {folder_path} (sorted naturally)")
+    # Prepare upcoming batch items in the background (bounded lookahead) so the CPU-side work -
+    # image decode/crop/resize and the 1.3B video re-encode - overlaps GPU generation of the current item.
+    # Prefetched re-encodes go to a subfolder that clean_temp_videos() leaves alone, since it runs
+    # after every item; they are removed here once their item is done.
+    reencode_videos = model_choice_radio == "WAN 2.1 1.3B (Text/Video-to-Video)"
+    prefetch_executor = ThreadPoolExecutor(max_workers=2)
+    prefetch_futures = {}
+    # Practical-RIFE runs queued by generate_videos on rife_pool; they overlap the next items' generation
+    rife_futures = []
+    rife_cancel_event.clear()
+    batch_finished = False
+    items_since_cache_clear = 0
+    
+    def prefetch_items(current_index):
+        for i in range(current_index, min(current_index + 1 + _BATCH_PREFETCH_LOOKAHEAD, total_files)):
+            if i in prefetch_futures:
+                continue
+            item_path = os.path.join(folder_path, files[i])
+            if os.path.splitext(files[i])[1].lower() != ".mp4":
+                prefetch_futures[i] = prefetch_executor.submit(_open_and_prepare, item_path, width, height, auto_crop)
+            elif reencode_videos:
+                prefetch_futures[i] = prefetch_executor.submit(
+                    reencode_video_to_16fps, item_path, int(num_frames), target_width=int(width), target_height=int(height),
+                    output_folder=_BATCH_PREFETCH_VIDEO_DIR, name_suffix=i)
+    
+    try:
+        for file_index, file in enumerate(files):
+            # Keep the next items preparing on the worker threads while this item generates
+            prefetch_items(file_index)
+            if cancel_batch_flag:
+                log_lines.append("[CMD] Batch processing cancelled by user.")
+                break
             
-        file_path = os.path.join(folder_path, file)
-        base, ext = os.path.splitext(file)
-        prompt_path = os.path.join(folder_path, base + ".txt")
-        if os.path.exists(prompt_path):
-            with open(prompt_path, "r", encoding="utf-8") as f:
-                prompt_content = f.read().strip()
-            if prompt_content == "":
-                log_text += f"[CMD] Prompt file {base+'.txt'} is empty, using default prompt.\\n"
-                prompt_content = default_prompt
+            file_path = os.path.join(folder_path, file)
+            base, ext = os.path.splitext(file)
+            prompt_name = txt_names.get((base + ".txt").lower())
+            if prompt_name is not None:
+                prompt_path = os.path.join(folder_path, prompt_name)
+                with open(prompt_path, "r", encoding="utf-8") as f:
+                    prompt_content = f.read().strip()
+                if prompt_content == "":
+                    log_lines.append(f"[CMD] Prompt file {prompt_name} is empty, using default prompt.")
+                    prompt_content = default_prompt
+                else:
+                    log_lines.append(f"[CMD] Using prompt from {prompt_name} for {file}")
             else:
-                log_text += f"[CMD] Using prompt from {base+'.txt'} for {file}\\n"
-        else:
-            log_text += f"[CMD] No prompt file for {file}, using default prompt.\\n"
-            prompt_content = default_prompt
+                log_lines.append(f"[CMD] No prompt file for {file}, using default prompt.")
+                prompt_content = default_prompt
             
-        if cancel_batch_flag:
-            log_text += "[CMD] Batch processing cancelled by user.\\n"
-            return log_text
+            if cancel_batch_flag:
+                log_lines.append("[CMD] Batch processing cancelled by user.")
+                break
             
-        ext_lower = ext.lower()
-        if ext_lower == ".mp4":
-            image_in = None
-            video_in = file_path
-            orig_video_path = file_path  # Save the original video path for audio transfer
+            ext_lower = ext.lower()
+            if ext_lower == ".mp4":
+                image_in = None
+                video_in = file_path
+                orig_video_path = file_path  # Save the original video path for audio transfer
             
-            # Re-encode the video to 16 FPS only if we're doing video-to-video with the 1.3B model
-            # Don't re-encode for image-to-video models that just use the last frame
-            if model_choice_radio == "WAN 2.1 1.3B (Text/Video-to-Video)":
-                # Ensure num_frames is valid before re-encoding
-                frames_to_use = int(num_frames)
-                log_text += f"[CMD] Processing video-to-video with 1.3B model for {file}, checking if re-encoding needed...\\n"
-                
-                # Import here to avoid circular imports
-                from video_utils import reencode_video_to_16fps
-                
-                reencoded_video = reencode_video_to_16fps(video_in, frames_to_use, target_width=int(width), target_height=int(height))
-                if reencoded_video != video_in:
-                    log_text += f"[CMD] Re-encoded input video {file} to 16 FPS: {reencoded_video}\\n"
-                    video_in = reencoded_video
-        else:
-            try:
-                loaded_img = Image.open(file_path)
-                loaded_img = ImageOps.exif_transpose(loaded_img)
-                image_in = loaded_img.convert("RGB")
-            except Exception as e:
-                log_text += f"[CMD] Error loading image {file_path}: {e}\\n"
-                continue
-            video_in = None
-            orig_video_path = None  # No original video for image inputs
+                # Re-encode the video to 16 FPS only if we're doing video-to-video with the 1.3B model
+                # Don't re-encode for image-to-video models that just use the last frame
+                if reencode_videos:
+                    log_lines.append(f"[CMD] Processing video-to-video with 1.3B model for {file}, checking if re-encoding needed...")
+                    reencoded_video = prefetch_futures.pop(file_index).result()
+                    if reencoded_video != video_in:
+                        log_lines.append(f"[CMD] Re-encoded input video {file} to 16 FPS: {reencoded_video}")
+                        video_in = reencoded_video
+            else:
+                try:
+                    image_in = prefetch_futures.pop(file_index).result()
+                except Exception as e:
+                    log_lines.append(f"[CMD] Error loading image {file_path}: {e}")
+                    continue
+                video_in = None
+                orig_video_path = None  # No original video for image inputs
         
-        if cancel_batch_flag:
-            log_text += "[CMD] Batch processing cancelled by user.\\n"
-            return log_text
+            if cancel_batch_flag:
+                log_lines.append("[CMD] Batch processing cancelled by user.")
+                break
             
-        custom_filename = base
+            custom_filename = base
 
-        print(f"[CMD] Processing batch item: {file_path}")
+            print(f"[CMD] Processing batch item: {file_path}")
         
-        # Use the original video path (if available) as the override_input_file to ensure audio is preserved
-        override_file = orig_video_path if ext_lower == ".mp4" else None
+            # Use the original video path (if available) as the override_input_file to ensure audio is preserved
+            override_file = orig_video_path if ext_lower == ".mp4" else None
         
-        generated_video, single_log, _ = generate_videos(
-            prompt_content, tar_lang, negative_prompt, image_in, video_in, denoising_strength, num_generations,
-            save_prompt, False, use_random_seed, seed_input, quality, fps,
-            model_choice_radio, vram_preset, num_persistent_input, torch_dtype, num_frames,
-            aspect_ratio, width, height, auto_crop, auto_scale, tiled, inference_steps, pr_rife_enabled, pr_rife_radio, cfg_scale, sigma_shift,
-            enable_teacache, tea_cache_l1_thresh, tea_cache_model_id,
-            lora_model, lora_alpha, lora_model_2, lora_alpha_2, lora_model_3, lora_alpha_3, lora_model_4, lora_alpha_4,
-            clear_cache_after_gen, extend_factor,
-            override_file,
-            output_dir_override=batch_output_folder,
-            custom_output_filename=custom_filename
-        )
-        log_text += single_log
+            generated_video, single_log, _ = generate_videos(
+                prompt_content, tar_lang, negative_prompt, image_in, video_in, denoising_strength, num_generations,
+                save_prompt, False, use_random_seed, seed_input, quality, fps,
+                model_choice_radio, vram_preset, num_persistent_input, torch_dtype, num_frames,
+                aspect_ratio, width, height, auto_crop, auto_scale, tiled, inference_steps, pr_rife_enabled, pr_rife_radio, cfg_scale, sigma_shift,
+                enable_teacache, tea_cache_l1_thresh, tea_cache_model_id,
+                lora_model, lora_alpha, lora_model_2, lora_alpha_2, lora_model_3, lora_alpha_3, lora_model_4, lora_alpha_4,
+                False, extend_factor,  # keep the pipeline loaded between items; cleared once after the batch
+                override_file,
+                output_dir_override=batch_output_folder,
+                custom_output_filename=custom_filename,
+                rife_futures=rife_futures
+            )
+            _extend_log(log_lines, single_log)
+            # Remove this item's prefetched re-encode (the original input is never deleted)
+            if video_in is not None and video_in != file_path:
+                remove_temp_file(video_in)
+            items_since_cache_clear, cache_log = maybe_release_cuda_cache(items_since_cache_clear + 1)
+            _extend_log(log_lines, cache_log)
         
-        if cancel_batch_flag:
-            log_text += "[CMD] Batch processing cancelled by user after file completion.\\n"
-            # Clean up temporary re-encoded videos
-            clean_temp_videos()
-            return log_text
-            
+            if cancel_batch_flag:
+                log_lines.append("[CMD] Batch processing cancelled by user after file completion.")
+                break
+        batch_finished = True
+    finally:
+        # Items run with clear_cache=False so the pipeline stays loaded across the batch; honor the
+        # setting once here, also when the batch is cancelled
+        if clear_cache_after_gen:
+            unload_pipeline()
+        # Cancel queued prefetches and let running re-encodes finish, so none is still writing into
+        # the prefetch folder after the cleanup below
+        prefetch_executor.shutdown(wait=True, cancel_futures=True)
+        # Drop prefetched re-encodes of items that were never processed
+        for future in prefetch_futures.values():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                result = future.result()
+                if isinstance(result, str) and os.path.dirname(os.path.abspath(result)) == os.path.abspath(_BATCH_PREFETCH_VIDEO_DIR):
+                    remove_temp_file(result)
+        # Deferred Practical-RIFE runs must not keep launching after a cancel (or an error)
+        if cancel_batch_flag or not batch_finished:
+            _extend_log(log_lines, cancel_rife_futures(rife_futures))
+        
+    _extend_log(log_lines, collect_rife_futures(rife_futures))
     # Clean up temporary re-encoded videos
     clean_temp_videos()
     # Clean up any remaining temporary files in batch output folder
     cleanup_tmp_files(batch_output_folder)
-    return log_text
+    return "\n".join(log_lines)
 
 def cancel_batch_process():
     global cancel_batch_flag, cancel_flag
     cancel_batch_flag = True
     cancel_flag = True
+    # Stop the batch's deferred Practical-RIFE runs right away
+    rife_cancel_event.set()
     print("[CMD] Batch process cancel button pressed.")
     return "Cancelling batch process...", "Cancelling any active generation..."
 
-def get_next_filename(extension, output_dir=DEFAULT_OUTPUT_DIR, custom_filename=None):
+# (output_dir, extension) -> next sequential number to try, seeded by one directory scan
+_next_filename_counter = {}
+
+def _scan_max_counter(output_dir, extension):
+    """Highest NNNN.<extension> number in output_dir, counting .tmp reservations too."""
+    suffixes = (f".{extension}", f".{extension}.tmp")
+    max_num = 0
+    with os.scandir(output_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            for suffix in suffixes:
+                if name.endswith(suffix):
+                    stem = name[:-len(suffix)]
+                    if stem.isdigit():
+                        max_num = max(max_num, int(stem))
+                    break
+    return max_num
+
+def get_next_filename(extension, output_dir=DEFAULT_OUTPUT_DIR, custom_filename=None, rescan=False):
     """
     Get next available filename in sequence using atomic file operations.
     Uses file locking to prevent race conditions between multiple app instances.
     
     If custom_filename is provided, it will attempt to use that name instead of a sequential number.
+    Sequential numbers continue from a per-folder counter seeded by one scan (rescan=True re-seeds it).
     
     Returns a tuple of (filename, temp_filename) where temp_filename is the temporary
     reservation file that should be cleaned up after the real file is created.
@@ -2203,8 +2566,12 @@ def get_next_filename(extension, output_dir=DEFAULT_OUTPUT_DIR, custom_filename=
                     return unique_filename, temp_filename
                 counter += 1
         
-        # Default behavior (no custom filename) - sequential numbers
-        counter = 1
+        # Default behavior (no custom filename) - sequential numbers after the highest one seen.
+        # The existence check stays so files written by another instance are still skipped.
+        key = (os.path.abspath(output_dir), extension)
+        if rescan or key not in _next_filename_counter:
+            _next_filename_counter[key] = _scan_max_counter(output_dir, extension) + 1
+        counter = _next_filename_counter[key]
         while True:
             filename = os.path.join(output_dir, f"{counter:04d}.{extension}")
             temp_filename = filename + ".tmp"
@@ -2216,6 +2583,7 @@ def get_next_filename(extension, output_dir=DEFAULT_OUTPUT_DIR, custom_filename=
                     # Add timestamp and instance info for debugging
                     f.write(f"Reserved by process {os.getpid()} at {datetime.now().isoformat()}")
                 
+                _next_filename_counter[key] = counter + 1
                 # Add a small random delay to further reduce collision chance
                 time.sleep(random.uniform(0.01, 0.05))
                 return filename, temp_filename
@@ -2235,97 +2603,174 @@ def open_outputs_folder():
     except Exception as e:
         return f"Error opening outputs folder: {e}"
 
-model_manager = ModelManager(device="cpu")
+# Created by load_wan_pipeline on first use
+model_manager = None
+
+_T5_FILE = "models_t5_umt5-xxl-enc-bf16.pth"
+_VAE_FILE = "Wan2.1_VAE.pth"
+_CLIP_FILE = "models_clip_open-clip-xlm-roberta-large-vit-huge-14.pth"
+
+def _model_manifest(folder, num_shards, needs_clip):
+    """DiT weight files for a model folder: one file, or the list of num_shards safetensors shards."""
+    model_dir = os.path.join("models", "Wan-AI", folder)
+    if num_shards == 1:
+        files = os.path.join(model_dir, "diffusion_pytorch_model.safetensors")
+    else:
+        files = [os.path.join(model_dir, f"diffusion_pytorch_model-{i:05d}-of-{num_shards:05d}.safetensors")
+                 for i in range(1, num_shards + 1)]
+    return {"model_dir": model_dir, "files": files, "num_shards": num_shards, "needs_clip": needs_clip}
+
+# Weight files per model slug; the shared T5/VAE/CLIP files are looked up in models/ first
+_MODEL_MANIFESTS = {
+    "1.3B": _model_manifest("Wan2.1-T2V-1.3B", 1, needs_clip=False),
+    "14B_text": _model_manifest("Wan2.1-T2V-14B", 6, needs_clip=False),
+    "14B_image_720p": _model_manifest("Wan2.1-I2V-14B-720P", 7, needs_clip=True),
+    "14B_image_480p": _model_manifest("Wan2.1-I2V-14B-480P", 7, needs_clip=True),
+}
+
+# Page-cache prefetch of model files: several readers keep the SSD queue full while DiffSynth
+# reads the shards one after another on a single thread
+_MODEL_PREFETCH_WORKERS = 4
+_MODEL_PREFETCH_CHUNK = 16 * 1024 * 1024
+
+def _flatten_model_paths(paths):
+    for path in paths:
+        if isinstance(path, (list, tuple)):
+            yield from _flatten_model_paths(path)
+        else:
+            yield path
+
+# Set to stop the readers of the previous prefetch (a new model load, or interpreter exit)
+_model_prefetch_stop = threading.Event()
+atexit.register(lambda: _model_prefetch_stop.set())
+
+def _read_into_page_cache(path, stop_event):
+    buffer = bytearray(_MODEL_PREFETCH_CHUNK)
+    with open(path, "rb", buffering=0) as f:
+        while not stop_event.is_set() and f.readinto(buffer):
+            pass
+
+def _model_prefetch_worker(pending, stop_event):
+    while not stop_event.is_set():
+        try:
+            path = pending.popleft()
+        except IndexError:
+            return
+        try:
+            _read_into_page_cache(path, stop_event)
+        except OSError as e:
+            print(f"[CMD] Model file prefetch failed for {path}: {e}")
+
+def prefetch_model_files(paths):
+    """
+    Start reading model files into the OS page cache on background daemon threads, largest first.
+    Skipped when the files don't fit in available RAM, where the prefetched pages would only be
+    evicted again before the loader reaches them. The readers stop between chunks on the next call
+    or at exit, so they never hold up Ctrl-C or shutdown.
+    """
+    global _model_prefetch_stop
+    _model_prefetch_stop.set()
+    _model_prefetch_stop = threading.Event()
+    files = [p for p in _flatten_model_paths(paths) if os.path.isfile(p)]
+    if not files:
+        return
+    total_size = sum(os.path.getsize(p) for p in files)
+    available = psutil.virtual_memory().available
+    if total_size > 0.8 * available:
+        print(f"[CMD] Skipping model file prefetch: {total_size / 1024**3:.1f} GB exceeds available RAM headroom")
+        return
+    pending = deque(sorted(files, key=os.path.getsize, reverse=True))
+    for i in range(min(_MODEL_PREFETCH_WORKERS, len(files))):
+        threading.Thread(target=_model_prefetch_worker, args=(pending, _model_prefetch_stop),
+                         name=f"model-prefetch-{i}", daemon=True).start()
+
+# Set from --fp8_dit_linear_only; quantizes only the DiT block linears to FP8 (bf16 pipelines only)
+FP8_DIT_LINEAR_ONLY = False
+
+# Set from --compile; compiles each DiT block with torch.compile after the pipeline is built
+TORCH_COMPILE = False
+INDUCTOR_CACHE_DIR = os.path.abspath(".inductor_cache")
+
+def compile_dit_blocks(pipe):
+    """
+    Compile every transformer block of the DiT in place. Blocks are compiled one by one rather than
+    the whole model so a graph break in the pipeline's offloading code only splits one block, and the
+    default mode is used because CUDA graphs ("reduce-overhead") can't follow weights that VRAM
+    management moves between devices. Dynamo recompiles on a new resolution/frame count by itself;
+    the persistent FX graph cache makes returning to an earlier shape a cache hit across restarts.
+    """
+    import torch
+    dit = getattr(pipe, "dit", None)
+    blocks = getattr(dit, "blocks", None)
+    if blocks is None or not hasattr(torch, "compile"):
+        print("[CMD] torch.compile unavailable for this pipeline, running eagerly.")
+        return
+    try:
+        os.makedirs(INDUCTOR_CACHE_DIR, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", INDUCTOR_CACHE_DIR)
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+        # Each resolution / frame count is its own specialization; keep enough of them around
+        torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 32)
+        for i, block in enumerate(blocks):
+            blocks[i] = torch.compile(block, dynamic=False)
+        print(f"[CMD] Compiled {len(blocks)} DiT blocks with torch.compile (cache: {INDUCTOR_CACHE_DIR}).")
+    except Exception as e:
+        print(f"[CMD] torch.compile failed, running eagerly: {e}")
+
+# Text-encoder outputs kept per pipeline; a T5 context is a few MB of VRAM each
+PROMPT_CACHE_SIZE = 16
+
+def cache_prompt_encoder(pipe, maxsize=PROMPT_CACHE_SIZE):
+    """
+    Wrap pipe.encode_prompt with a small LRU keyed on the prompt text, so batches and multi-generation
+    runs that reuse a prompt (or the negative prompt) skip the T5 forward. The cache lives on the
+    pipeline instance and is dropped with it when the model or dtype changes.
+    """
+    encode_prompt = getattr(pipe, "encode_prompt", None)
+    if encode_prompt is None:
+        return
+    cache = OrderedDict()
+
+    def cached_encode_prompt(prompt, *args, **kwargs):
+        if not isinstance(prompt, str):
+            return encode_prompt(prompt, *args, **kwargs)
+        key = (prompt, args, tuple(sorted(kwargs.items())))
+        if key in cache:
+            cache.move_to_end(key)
+            return dict(cache[key])
+        result = encode_prompt(prompt, *args, **kwargs)
+        if isinstance(result, dict):
+            cache[key] = result
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+            return dict(result)
+        return result
+
+    pipe.encode_prompt = cached_encode_prompt
 
 def load_wan_pipeline(model_choice, torch_dtype_str, num_persistent, lora_path=None, lora_alpha=None):
+    import torch
+    from diffsynth import ModelManager, WanVideoPipeline
     print(f"[CMD] Loading model: {model_choice} with torch dtype: {torch_dtype_str} and num_persistent_param_in_dit: {num_persistent}")
     device = "cuda"
     torch_dtype = torch.float8_e4m3fn if torch_dtype_str == "torch.float8_e4m3fn" else torch.bfloat16
     global model_manager
     model_manager = ModelManager(device="cpu")
-    if model_choice == "1.3B":
-        t5_path = get_common_file(os.path.join("models", "models_t5_umt5-xxl-enc-bf16.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-T2V-1.3B", "models_t5_umt5-xxl-enc-bf16.pth"))
-        vae_path = get_common_file(os.path.join("models", "Wan2.1_VAE.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-T2V-1.3B", "Wan2.1_VAE.pth"))
-        model_manager.load_models(
-            [
-                os.path.join("models", "Wan-AI", "Wan2.1-T2V-1.3B", "diffusion_pytorch_model.safetensors"),
-                t5_path,
-                vae_path,
-            ],
-            torch_dtype=torch_dtype,
-        )
-    elif model_choice == "14B_text":
-        t5_path = get_common_file(os.path.join("models", "models_t5_umt5-xxl-enc-bf16.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "models_t5_umt5-xxl-enc-bf16.pth"))
-        vae_path = get_common_file(os.path.join("models", "Wan2.1_VAE.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "Wan2.1_VAE.pth"))
-        model_manager.load_models(
-            [
-                [
-                    os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "diffusion_pytorch_model-00001-of-00006.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "diffusion_pytorch_model-00002-of-00006.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "diffusion_pytorch_model-00003-of-00006.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "diffusion_pytorch_model-00004-of-00006.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "diffusion_pytorch_model-00005-of-00006.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-T2V-14B", "diffusion_pytorch_model-00006-of-00006.safetensors")
-                ],
-                t5_path,
-                vae_path,
-            ],
-            torch_dtype=torch_dtype,
-        )
-    elif model_choice == "14B_image_720p":
-        clip_path = get_common_file(os.path.join("models", "models_clip_open-clip-xlm-roberta-large-vit-huge-14.pth"),
-                                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "models_clip_open-clip-xlm-roberta-large-vit-huge-14.pth"))
-        t5_path = get_common_file(os.path.join("models", "models_t5_umt5-xxl-enc-bf16.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "models_t5_umt5-xxl-enc-bf16.pth"))
-        vae_path = get_common_file(os.path.join("models", "Wan2.1_VAE.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "Wan2.1_VAE.pth"))
-        model_manager.load_models([clip_path], torch_dtype=torch.float32)
-        model_manager.load_models(
-            [
-                [
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "diffusion_pytorch_model-00001-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "diffusion_pytorch_model-00002-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "diffusion_pytorch_model-00003-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "diffusion_pytorch_model-00004-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "diffusion_pytorch_model-00005-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "diffusion_pytorch_model-00006-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-720P", "diffusion_pytorch_model-00007-of-00007.safetensors"),
-                ],
-                t5_path,
-                vae_path,
-            ],
-            torch_dtype=torch_dtype,
-        )        
-    elif model_choice == "14B_image_480p":
-        clip_path = get_common_file(os.path.join("models", "models_clip_open-clip-xlm-roberta-large-vit-huge-14.pth"),
-                                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "models_clip_open-clip-xlm-roberta-large-vit-huge-14.pth"))
-        t5_path = get_common_file(os.path.join("models", "models_t5_umt5-xxl-enc-bf16.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "models_t5_umt5-xxl-enc-bf16.pth"))
-        vae_path = get_common_file(os.path.join("models", "Wan2.1_VAE.pth"),
-                                  os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "Wan2.1_VAE.pth"))
-        model_manager.load_models([clip_path], torch_dtype=torch.float32)
-        model_manager.load_models(
-            [
-                [
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "diffusion_pytorch_model-00001-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "diffusion_pytorch_model-00002-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "diffusion_pytorch_model-00003-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "diffusion_pytorch_model-00004-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "diffusion_pytorch_model-00005-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "diffusion_pytorch_model-00006-of-00007.safetensors"),
-                    os.path.join("models", "Wan-AI", "Wan2.1-I2V-14B-480P", "diffusion_pytorch_model-00007-of-00007.safetensors"),
-                ],
-                t5_path,
-                vae_path,
-            ],
-            torch_dtype=torch_dtype,
-        )
-    else:
+    manifest = _MODEL_MANIFESTS.get(model_choice)
+    if manifest is None:
         raise ValueError("Invalid model choice")
+    model_dir = manifest["model_dir"]
+    t5_path = get_common_file(os.path.join("models", _T5_FILE), os.path.join(model_dir, _T5_FILE))
+    vae_path = get_common_file(os.path.join("models", _VAE_FILE), os.path.join(model_dir, _VAE_FILE))
+    model_files = [manifest["files"], t5_path, vae_path]
+    clip_path = None
+    if manifest["needs_clip"]:
+        clip_path = get_common_file(os.path.join("models", _CLIP_FILE), os.path.join(model_dir, _CLIP_FILE))
+    prefetch_model_files(model_files + ([clip_path] if clip_path else []))
+    if clip_path:
+        model_manager.load_models([clip_path], torch_dtype=torch.float32)
+    model_manager.load_models(model_files, torch_dtype=torch_dtype)
     if lora_path is not None:
         if isinstance(lora_path, list):
             for path, alpha in lora_path:
@@ -2353,7 +2798,22 @@ def load_wan_pipeline(model_choice, torch_dtype_str, num_persistent, lora_path=N
         print("[CMD] Warning: could not parse num_persistent value, defaulting to 6000000000")
         num_persistent_val = 6000000000
     print(f"num_persistent_val {num_persistent_val}")
+    fp8_linears = 0
+    if FP8_DIT_LINEAR_ONLY and torch_dtype == torch.bfloat16:
+        from fp8_linear import quantize_dit_linears
+        fp8_linears = quantize_dit_linears(pipe.dit)
+        print(f"[CMD] Quantized {fp8_linears} DiT block linears to FP8 E4M3 (per-tensor scales).")
     pipe.enable_vram_management(num_persistent_param_in_dit=num_persistent_val)
+    cache_prompt_encoder(pipe)
+    if fp8_linears:
+        from fp8_linear import place_fp8_linears
+        resident = place_fp8_linears(pipe.dit, device, num_persistent_val)
+        print(f"[CMD] {resident} FP8 DiT parameters resident on {device}.")
+    if TORCH_COMPILE:
+        compile_dit_blocks(pipe)
+    # Return the blocks freed while moving weights for VRAM management before generation starts
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
     print("[CMD] Model loaded successfully.")
     return pipe
 
@@ -2386,6 +2846,8 @@ def cleanup_tmp_files(directory=None):
     try:
         tmp_files = glob.glob(os.path.join(directory, "*.tmp"))
         for tmp_file in tmp_files:
+            if os.path.abspath(tmp_file) in _active_rife_reservations:
+                continue
             try:
                 os.remove(tmp_file)
                 print(f"[CMD] Cleaned up temporary file: {tmp_file}")
@@ -2440,8 +2902,24 @@ if __name__ == "__main__":
                         help="The prompt extend method to use.")
     parser.add_argument("--prompt_extend_model", type=str, default=None, help="The prompt extend model to use.")
     parser.add_argument("--share", action="store_true", help="Share the Gradio app publicly.")
+    parser.add_argument("--fp8_dit_linear_only", action="store_true",
+                        help="With torch.bfloat16, store only the DiT block linear weights in FP8 E4M3; embeddings, head and encoders stay bf16.")
+    parser.add_argument("--compile", action="store_true",
+                        help="Compile the DiT blocks with torch.compile (slow first generation, faster after; cached in .inductor_cache).")
+    parser.add_argument("--gpu_image_prep", action="store_true",
+                        help="Run the single-image auto crop / auto scale on the GPU (bicubic) instead of the CPU (Lanczos).")
+    parser.add_argument("--max_rife_parallel", type=int, default=None,
+                        help=f"Maximum number of Practical-RIFE runs overlapping batch generation (default: {MAX_RIFE_PARALLEL}).")
     parser.add_argument("--outputs", type=str, default=None, help="Specify the default output directory (e.g., --outputs \"C:\My Videos\" or --outputs \"/home/user/videos\").") # New argument
     args = parser.parse_args()
+    if args.fp8_dit_linear_only:
+        FP8_DIT_LINEAR_ONLY = True
+    if args.compile:
+        TORCH_COMPILE = True
+    if args.gpu_image_prep:
+        GPU_IMAGE_PREP = True
+    if args.max_rife_parallel is not None:
+        MAX_RIFE_PARALLEL = max(1, args.max_rife_parallel)
     
     # Update default output directory if provided via CLI
     if args.outputs:
@@ -2471,6 +2949,7 @@ if __name__ == "__main__":
                 with gr.Row():
                     generate_button = gr.Button("Generate", variant="primary")
                     cancel_button = gr.Button("Cancel")
+                    unload_model_button = gr.Button("Unload Model")
                     fast_preset_button = gr.Button("Apply Fast Preset", variant="huggingface")
                     enhance_button = gr.Button("Prompt Enhance", variant="primary")
                 prompt_box = gr.Textbox(label="Prompt (A <random: green , yellow , etc > car) will take random word with trim like : A yellow car", placeholder="Describe the video you want to generate", lines=5, value=config_loaded.get("prompt", ""))                
@@ -2535,7 +3014,8 @@ if __name__ == "__main__":
                             sigma_shift_slider = gr.Slider(minimum=1, maximum=12, step=0.1, value=config_loaded.get("sigma_shift", 6.0), label="Sigma Shift")
                 gr.Markdown("### GPU Settings - If you get out of VRAM error or if it uses shared VRAM, reduce this number, FP8 may generate color broken at the moment in I2V")
                 with gr.Row():
-                    num_persistent_text = gr.Textbox(label="Number of Persistent Parameters In Dit (VRAM)", value=config_loaded.get("num_persistent", "12000000000"))
+                    num_persistent_text = gr.Textbox(label="Number of Persistent Parameters In Dit (VRAM)",
+                                                     info="Outside Windows the app enables PyTorch's expandable_segments CUDA allocator (PyTorch 2.1+) to reduce VRAM fragmentation", value=config_loaded.get("num_persistent", "12000000000"))
                     torch_dtype_radio = gr.Radio(
                         choices=["torch.float8_e4m3fn", "torch.bfloat16"],
                         label="torch.float8_e4m3fn is FP8 and reduces VRAM and RAM usage a lot with little quality loss. torch.bfloat16 is BF16 (max quality)",
@@ -2584,7 +3064,7 @@ if __name__ == "__main__":
                     denoising_slider = gr.Slider(minimum=0.0, maximum=1.0, step=0.05, value=config_loaded.get("denoising_strength", 0.7),
                                              label="Denoising Strength (only for video-to-video)")
                 with gr.Row():
-                    image_input = gr.Image(type="pil", label="Input Image (for image-to-video)", height=512)
+                    image_input = gr.Image(type="filepath", label="Input Image (for image-to-video)", height=512)
                     video_input = gr.Video(label="Input Video (for Video-to-Video, only for 1.3B) or Extending Existing Video (Uses Last Frame, for Image-to-Video models)", format="mp4", height=512)
                 with gr.Row():
                     clear_cache_checkbox = gr.Checkbox(label="Clear model from RAM and VRAM after generation - not working very well yet", value=config_loaded.get("clear_cache_after_gen", DEFAULT_CLEAR_CACHE))
@@ -2661,6 +3141,7 @@ if __name__ == "__main__":
             outputs=[video_output, status_output, last_seed_output]
         )
         cancel_button.click(fn=cancel_generation, outputs=status_output)
+        unload_model_button.click(fn=unload_pipeline, outputs=status_output)
         fast_preset_button.click(fn=apply_fast_preset, inputs=[], outputs=[inference_steps_slider, enable_teacache_checkbox , tea_cache_l1_thresh_slider, sigma_shift_slider])
         open_outputs_button.click(fn=open_outputs_folder, outputs=status_output)
         batch_process_button.click(
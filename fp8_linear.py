@@ -0,0 +1,114 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+FP8_DTYPE = getattr(torch, "float8_e4m3fn", None)
+FP8_MAX = 448.0
+
+# Only the transformer blocks are quantized; embeddings, time/text projections and the output head
+# stay in the pipeline dtype because they are small and the most sensitive to rounding
+FP8_DIT_PREFIXES = ("blocks.",)
+
+_scaled_mm_support = {}
+
+def _supports_scaled_mm(device):
+    """FP8 tensor-core matmuls need torch._scaled_mm and an Ada/Hopper or newer GPU (sm_89+)."""
+    if device.type != "cuda" or not hasattr(torch, "_scaled_mm"):
+        return False
+    index = device.index if device.index is not None else torch.cuda.current_device()
+    if index not in _scaled_mm_support:
+        _scaled_mm_support[index] = torch.cuda.get_device_capability(index) >= (8, 9)
+    return _scaled_mm_support[index]
+
+def _per_tensor_scale(t):
+    return (t.detach().abs().amax().float() / FP8_MAX).clamp(min=1e-12)
+
+class FP8Linear(nn.Module):
+    """
+    Linear layer holding an FP8 E4M3 weight with a per-tensor scale. Activations are quantized
+    per-tensor on the fly and multiplied with torch._scaled_mm when the GPU supports it; otherwise
+    the weight is dequantized to the activation dtype and a regular linear is used.
+    """
+
+    def __init__(self, in_features, out_features, weight, weight_scale, bias=None):
+        super().__init__()
+        self.in_features = in_features
+        self.out_features = out_features
+        self.register_buffer("weight", weight)
+        self.register_buffer("weight_scale", weight_scale)
+        self.register_buffer("bias", bias)
+
+    @classmethod
+    def from_linear(cls, linear):
+        # Any LoRA has already been merged into the weight by the model manager, so its
+        # alpha-scaled delta is carried into the quantized tensor here
+        weight = linear.weight.detach()
+        scale = _per_tensor_scale(weight)
+        weight_fp8 = (weight.float() / scale).clamp(-FP8_MAX, FP8_MAX).to(FP8_DTYPE)
+        bias = linear.bias.detach().clone() if linear.bias is not None else None
+        return cls(linear.in_features, linear.out_features, weight_fp8, scale, bias)
+
+    def forward(self, x):
+        weight = self.weight.to(x.device, non_blocking=True)
+        weight_scale = self.weight_scale.to(x.device, non_blocking=True)
+        bias = self.bias.to(x.device, dtype=x.dtype, non_blocking=True) if self.bias is not None else None
+        out_dtype = x.dtype if x.dtype in (torch.bfloat16, torch.float16) else torch.bfloat16
+        if (_supports_scaled_mm(x.device) and self.in_features % 16 == 0
+                and self.out_features % 16 == 0):
+            x2 = x.reshape(-1, self.in_features)
+            x_scale = _per_tensor_scale(x2)
+            x_fp8 = (x2.float() / x_scale).clamp(-FP8_MAX, FP8_MAX).to(FP8_DTYPE)
+            out = torch._scaled_mm(x_fp8, weight.t(), scale_a=x_scale, scale_b=weight_scale, out_dtype=out_dtype)
+            # PyTorch < 2.4 returns (out, amax)
+            if isinstance(out, tuple):
+                out = out[0]
+            if bias is not None:
+                out = out + bias.to(out_dtype)
+            return out.reshape(*x.shape[:-1], self.out_features).to(x.dtype)
+        return F.linear(x, weight.to(x.dtype) * weight_scale.to(x.dtype), bias)
+
+    def extra_repr(self):
+        return f"in_features={self.in_features}, out_features={self.out_features}, bias={self.bias is not None}"
+
+def quantize_dit_linears(dit, prefixes=FP8_DIT_PREFIXES):
+    """
+    Replace the nn.Linear modules of dit whose qualified name starts with one of prefixes by
+    FP8Linear. Returns the number of layers converted.
+    """
+    if FP8_DTYPE is None:
+        print("[CMD] This PyTorch build has no float8_e4m3fn dtype; skipping FP8 DiT quantization.")
+        return 0
+    targets = [(name, module) for name, module in dit.named_modules()
+               if type(module) is nn.Linear and name.startswith(prefixes)]
+    for name, module in targets:
+        parent_name, _, child_name = name.rpartition(".")
+        parent = dit.get_submodule(parent_name) if parent_name else dit
+        setattr(parent, child_name, FP8Linear.from_linear(module))
+    return len(targets)
+
+def place_fp8_linears(dit, device, max_num_param):
+    """
+    Move FP8Linear weights to device while the parameters already resident there (those kept by
+    the pipeline's VRAM management) plus these stay within max_num_param. The rest are pinned in
+    host memory so the copy to the activation's device on each call runs asynchronously.
+    Returns the count moved.
+    """
+    device = torch.device(device)
+    fp8_tensors = {id(t) for m in dit.modules() if isinstance(m, FP8Linear) for t in m.buffers()}
+    already_resident = sum(t.numel() for t in list(dit.parameters()) + list(dit.buffers())
+                           if t.device.type == device.type and id(t) not in fp8_tensors)
+    budget = max(0, max_num_param - already_resident)
+    pin = device.type == "cuda" and torch.cuda.is_available()
+    resident = 0
+    for module in dit.modules():
+        if not isinstance(module, FP8Linear):
+            continue
+        numel = module.weight.numel()
+        if resident + numel <= budget:
+            module.to(device)
+            resident += numel
+        elif pin and module.weight.device.type == "cpu":
+            for name, tensor in list(module.named_buffers(recurse=False)):
+                if tensor is not None and not tensor.is_pinned():
+                    setattr(module, name, tensor.pin_memory())
+    return resident
@@ -2,11 +2,110 @@ import os
 import cv2
 import subprocess
 import time
-import numpy as np
 from pathlib import Path
 import traceback
 
-def reencode_video_to_16fps(input_video_path, num_frames, target_width=None, target_height=None):
+# PyAV is optional: when installed, probe_video reads stream headers without creating a decoder
+try:
+    import av
+except ImportError:
+    av = None
+
+def sample_frame_positions(total_frames, frames_to_extract, max_frames):
+    """
+    Return the increasing source frame indices to keep when spreading frames_to_extract
+    frames evenly over a video of total_frames frames (at most max_frames indices).
+    """
+    if max_frames <= 0:
+        return []
+    
+    # Calculate frame step to evenly distribute frames if input has more frames than needed
+    if total_frames > 1 and frames_to_extract > 1:
+        frame_step = (total_frames - 1) / (frames_to_extract - 1)
+    else:
+        frame_step = 1
+    
+    positions = [0]
+    current_pos = 0
+    while len(positions) < max_frames and current_pos < total_frames - 1:
+        next_pos = int(min(current_pos + frame_step, total_frames - 1))
+        if next_pos <= current_pos:
+            next_pos = current_pos + 1
+        positions.append(next_pos)
+        current_pos = next_pos
+    return positions
+
+def center_crop_box(src_width, src_height, target_width, target_height):
+    """
+    Return (x, y, width, height) of the centered region of a src_width x src_height frame
+    that matches the target aspect ratio. Aspect ratios within 1% are treated as equal.
+    """
+    input_aspect = src_width / src_height
+    target_aspect = target_width / target_height
+    if abs(input_aspect - target_aspect) < 0.01:
+        return 0, 0, src_width, src_height
+    if input_aspect > target_aspect:
+        # Input is wider than target - crop width
+        crop_w = int(src_height * target_aspect)
+        return (src_width - crop_w) // 2, 0, crop_w, src_height
+    # Input is taller than target - crop height
+    crop_h = int(src_width / target_aspect)
+    return 0, (src_height - crop_h) // 2, src_width, crop_h
+
+# (absolute path, mtime_ns, size) -> (fps, width, height, frame_count)
+_probe_cache = {}
+
+def probe_video(video_path):
+    """
+    Read (fps, width, height, frame_count) from the video header with a single open,
+    using PyAV when it is installed and OpenCV otherwise.
+    Results are memoized on path + mtime + size, so repeated probes of an unchanged file are free.
+    Returns None if the video cannot be opened.
+    """
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    key = (os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+    cached = _probe_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    info = _probe_video_av(video_path) if av is not None else None
+    if info is None:
+        cap = cv2.VideoCapture(video_path)
+        try:
+            if not cap.isOpened():
+                return None
+            info = (
+                cap.get(cv2.CAP_PROP_FPS),
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            )
+        finally:
+            cap.release()
+    _probe_cache[key] = info
+    return info
+
+def _probe_video_av(video_path):
+    """
+    Header-only probe through PyAV. Returns None (so the OpenCV path is used) if the file can't be
+    opened or the container doesn't store a frame count.
+    """
+    try:
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            rate = stream.average_rate or stream.guessed_rate
+            if not stream.frames or not rate:
+                return None
+            return float(rate), stream.codec_context.width, stream.codec_context.height, int(stream.frames)
+    except Exception:
+        return None
+
+def reencode_video_to_16fps(input_video_path, num_frames, target_width=None, target_height=None, *,
+                            orig_fps=None, orig_w=None, orig_h=None, orig_frame_count=None,
+                            output_folder="auto_pre_processed_videos", name_suffix=None):
     """
     Re-encodes the input video to 16 FPS and trims it to match the desired frame count.
     Also handles resizing to match target dimensions if provided.
@@ -16,28 +115,34 @@ def reencode_video_to_16fps(input_video_path, num_frames, target_width=None, tar
         num_frames: Number of frames requested by the user
         target_width: Target width for the output video (optional)
         target_height: Target height for the output video (optional)
+        orig_fps, orig_w, orig_h, orig_frame_count: Already probed input properties (optional);
+            missing values are read with probe_video()
+        output_folder: Folder for the re-encoded video; files directly in auto_pre_processed_videos
+            are removed by clean_temp_videos()
+        name_suffix: Extra tag added to the output name (optional); callers re-encoding several
+            videos at once pass a unique one so sanitized names from the same second can't collide
         
     Returns:
         Path to the re-encoded video
     """
-    cap = None
     verify_cap = None
-    frames_dir = None
-    temp_audio_file = None
-    temp_video_file = None
     timestamp = int(time.time())
     
     try:
-        cap = cv2.VideoCapture(input_video_path)
-        if not cap.isOpened():
-            print(f"[CMD] Could not open video {input_video_path}")
-            return input_video_path
-        
-        # Get input video properties
-        input_fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        input_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        input_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Get input video properties, probing the header only for values the caller didn't pass
+        if None in (orig_fps, orig_w, orig_h, orig_frame_count):
+            probe = probe_video(input_video_path)
+            if probe is None:
+                print(f"[CMD] Could not open video {input_video_path}")
+                return input_video_path
+            orig_fps = probe[0] if orig_fps is None else orig_fps
+            orig_w = probe[1] if orig_w is None else orig_w
+            orig_h = probe[2] if orig_h is None else orig_h
+            orig_frame_count = probe[3] if orig_frame_count is None else orig_frame_count
+        input_fps = orig_fps
+        total_frames = int(orig_frame_count)
+        input_width = int(orig_w)
+        input_height = int(orig_h)
         
         # If target dimensions aren't specified, use input dimensions
         if target_width is None:
@@ -64,12 +169,10 @@ def reencode_video_to_16fps(input_video_path, num_frames, target_width=None, tar
             needs_reencoding = True
         
         if not needs_reencoding:
-            cap.release()
             print(f"[CMD] Video already meets requirements, no re-encoding needed")
             return input_video_path
         
         # Create output directory
-        output_folder = "auto_pre_processed_videos"
         os.makedirs(output_folder, exist_ok=True)
         
         # Sanitize filename - only allow English letters and underscore, max 75 chars
@@ -89,24 +192,10 @@ def reencode_video_to_16fps(input_video_path, num_frames, target_width=None, tar
         if len(sanitized_name) > 60:
             sanitized_name = sanitized_name[:60]
         
-        reencoded_video = os.path.join(output_folder, f"reencoded_{timestamp}_{sanitized_name}{ext}")
-        frames_dir = os.path.join(output_folder, f"temp_frames_{timestamp}")
-        os.makedirs(frames_dir, exist_ok=True)
-        
-        # Calculate duration to extract based on num_frames at 16fps
-        target_duration_sec = (num_frames - 1) / 16
-        input_duration_sec = total_frames / input_fps
-        
-        # Use the shorter of the two durations to ensure we don't exceed input length
-        extract_duration_sec = min(target_duration_sec, input_duration_sec)
-        print(f"[CMD] Extracting {extract_duration_sec:.2f} seconds from input video")
-        
-        # Step 1: Extract exactly num_frames frames, with proper resizing and aspect ratio
-        frames = []
+        if name_suffix is not None:
+            sanitized_name = f"{name_suffix}_{sanitized_name}"
         
-        # Calculate input aspect ratio
-        input_aspect = input_width / input_height
-        target_aspect = target_width / target_height
+        reencoded_video = os.path.join(output_folder, f"reencoded_{timestamp}_{sanitized_name}{ext}")
         
         # Determine how many frames to extract from input
         frames_to_extract = min(num_frames, total_frames)
@@ -116,383 +205,69 @@ def reencode_video_to_16fps(input_video_path, num_frames, target_width=None, tar
         if missing_frames > 0:
             print(f"[CMD] Input video has fewer frames than needed. Will duplicate first frame {missing_frames} times.")
         
-        # Read the first frame (which might need to be duplicated)
-        success, first_frame = cap.read()
-        if not success:
-            cap.release()
-            print(f"[CMD] Could not read first frame from video")
+        # Source frame indices to keep, evenly spread over the input when it has more frames than needed
+        frame_positions = sample_frame_positions(total_frames, frames_to_extract, num_frames - missing_frames)
+        
+        # Source region that keeps the target aspect ratio
+        crop_x, crop_y, crop_w, crop_h = center_crop_box(input_width, input_height, target_width, target_height)
+        
+        # Build one filter graph: pick the sampled frames, retime them to 16 FPS, crop + area-downscale in YUV,
+        # then clone the first frame for missing frames and the last frame if the decode comes up short
+        filters = []
+        if frame_positions != list(range(len(frame_positions))):
+            filters.append("select='" + "+".join(f"eq(n,{pos})" for pos in frame_positions) + "'")
+        filters.append("setpts=N/16/TB")
+        filters.append("fps=16")
+        # Crop and scale the planar 4:2:0 frames directly (chroma at quarter size), so no RGB/BGR
+        # conversion happens anywhere between the decoder and libx264
+        filters.append("format=yuv420p")
+        if (crop_x, crop_y, crop_w, crop_h) != (0, 0, input_width, input_height):
+            filters.append(f"crop={crop_w}:{crop_h}:{crop_x}:{crop_y}")
+        filters.append(f"scale={target_width}:{target_height}:flags=area")
+        filters.append(f"tpad=start={missing_frames}:start_mode=clone:stop=-1:stop_mode=clone")
+        
+        # The output length is set by the video (-frames:v); the audio is padded with silence and trimmed
+        # to exactly num_frames at 16 FPS instead of letting -shortest cut the video to the audio
+        audio_args = []
+        if check_video_has_audio(input_video_path):
+            audio_args = ['-map', '0:a:0', '-af', f"apad,atrim=end={num_frames / 16:.6f}",
+                          '-c:a', 'aac', '-b:a', '192k']
+        
+        encode_cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-hwaccel', 'auto',
+            '-i', input_video_path,
+            '-map', '0:v:0',
+            '-vf', ",".join(filters),
+            '-frames:v', str(num_frames),
+            '-c:v', 'libx264',
+            '-fps_mode', 'passthrough',
+            '-profile:v', 'high',
+            '-level', '3.1',
+            '-preset', 'veryslow',
+            '-crf', '12',
+            '-pix_fmt', 'yuv420p',
+            *audio_args,
+            reencoded_video
+        ]
+        
+        print(f"[CMD] Re-encoding with a single ffmpeg pass ({len(frame_positions)} source frames, {missing_frames} padded)")
+        result = subprocess.run(encode_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0 or not os.path.exists(reencoded_video):
+            print(f"[CMD] ffmpeg re-encode failed: {result.stderr.strip()}")
             return input_video_path
-            
-        # Process the first frame (resize/crop)
-        if abs(input_aspect - target_aspect) < 0.01:
-            # Simple resize if aspect ratios are close enough
-            first_frame_processed = cv2.resize(first_frame, (target_width, target_height))
-        else:
-            # Need to crop and scale to maintain aspect ratio
-            if input_aspect > target_aspect:
-                # Input is wider than target - crop width
-                new_width = int(input_height * target_aspect)
-                crop_x = int((input_width - new_width) / 2)
-                cropped = first_frame[:, crop_x:crop_x+new_width]
-                first_frame_processed = cv2.resize(cropped, (target_width, target_height))
-            else:
-                # Input is taller than target - crop height
-                new_height = int(input_width / target_aspect)
-                crop_y = int((input_height - new_height) / 2)
-                cropped = first_frame[crop_y:crop_y+new_height, :]
-                first_frame_processed = cv2.resize(cropped, (target_width, target_height))
-        
-        # Add duplicated first frames if needed
-        for i in range(missing_frames):
-            frames.append(first_frame_processed.copy())
-            frame_path = os.path.join(frames_dir, f"frame_{i:06d}.png")
-            cv2.imwrite(frame_path, first_frame_processed)
-            
-        # Process the remaining frames
-        frame_count = missing_frames
-        frames.append(first_frame_processed)  # Add the actual first frame
-        frame_path = os.path.join(frames_dir, f"frame_{frame_count:06d}.png")
-        cv2.imwrite(frame_path, first_frame_processed)
-        frame_count += 1
-        
-        # If we need more frames, continue reading from input
-        if frame_count < num_frames:
-            # Calculate frame step to evenly distribute frames if input has more frames than needed
-            if total_frames > 1 and frames_to_extract > 1:
-                frame_step = (total_frames - 1) / (frames_to_extract - 1)
-            else:
-                frame_step = 1
-                
-            current_pos = 0
-            
-            while frame_count < num_frames and current_pos < total_frames - 1:
-                # Calculate next frame to extract
-                next_pos = int(min(current_pos + frame_step, total_frames - 1))
-                if next_pos <= current_pos:
-                    next_pos = current_pos + 1
-                
-                # Set position
-                cap.set(cv2.CAP_PROP_POS_FRAMES, next_pos)
-                success, frame = cap.read()
-                if not success:
-                    break
-                
-                # Process frame (resize/crop)
-                if abs(input_aspect - target_aspect) < 0.01:
-                    # Simple resize
-                    frame_processed = cv2.resize(frame, (target_width, target_height))
-                else:
-                    # Crop and scale
-                    if input_aspect > target_aspect:
-                        # Input is wider than target - crop width
-                        new_width = int(input_height * target_aspect)
-                        crop_x = int((input_width - new_width) / 2)
-                        cropped = frame[:, crop_x:crop_x+new_width]
-                        frame_processed = cv2.resize(cropped, (target_width, target_height))
-                    else:
-                        # Input is taller than target - crop height
-                        new_height = int(input_width / target_aspect)
-                        crop_y = int((input_height - new_height) / 2)
-                        cropped = frame[crop_y:crop_y+new_height, :]
-                        frame_processed = cv2.resize(cropped, (target_width, target_height))
-                
-                frames.append(frame_processed)
-                frame_path = os.path.join(frames_dir, f"frame_{frame_count:06d}.png")
-                cv2.imwrite(frame_path, frame_processed)
-                
-                # Update positions
-                current_pos = next_pos
-                frame_count += 1
-        
-        cap.release()
-        cap = None
-        
-        # Ensure we have exactly num_frames
-        if len(frames) != num_frames:
-            print(f"[CMD] Warning: Extracted {len(frames)} frames, but target is {num_frames}")
-            # If we have too few frames, duplicate the last frame
-            while len(frames) < num_frames:
-                frames.append(frames[-1].copy())
-                frame_path = os.path.join(frames_dir, f"frame_{len(frames)-1:06d}.png")
-                cv2.imwrite(frame_path, frames[-1])
-            # If we have too many frames, truncate
-            if len(frames) > num_frames:
-                frames = frames[:num_frames]
-        
-        print(f"[CMD] Successfully extracted and processed {len(frames)} frames")
-        
-        # Verify frame files exist in temporary directory
-        frame_files = sorted([f for f in os.listdir(frames_dir) if f.startswith("frame_")])
-        if len(frame_files) != num_frames:
-            print(f"[CMD] Warning: Found {len(frame_files)} frame files but expected {num_frames}")
-            # Ensure all frames exist by checking for gaps
-            for i in range(num_frames):
-                expected_frame = f"frame_{i:06d}.png"
-                if expected_frame not in frame_files:
-                    print(f"[CMD] Missing frame file: {expected_frame}, duplicating adjacent frame")
-                    # Find the closest existing frame
-                    closest_idx = min(max(0, i-1), len(frames)-1)
-                    # Save a copy of the closest frame
-                    cv2.imwrite(os.path.join(frames_dir, expected_frame), frames[closest_idx])
-            # Recheck frame files
-            frame_files = sorted([f for f in os.listdir(frames_dir) if f.startswith("frame_")])
-            print(f"[CMD] After fix: {len(frame_files)} frame files")
-        
-        # Check if input video has audio - use direct FFprobe method
-        print(f"[CMD] Checking if input video has audio: {input_video_path}")
-        has_audio = check_video_has_audio(input_video_path)
-        print(f"[CMD] Input video has audio: {has_audio}")
-        
-        temp_audio_file = None
-        
-        # Extract audio if present using ffmpeg directly
-        if has_audio:
-            temp_audio_file = os.path.join(output_folder, f"temp_audio_{timestamp}.aac")
-            
-            # Use ffmpeg to extract audio
-            extract_cmd = [
-                'ffmpeg', '-y',
-                '-i', f'"{input_video_path}"',
-                '-t', str(extract_duration_sec),
-                '-vn',
-                '-c:a', 'aac',
-                '-b:a', '192k',
-                f'"{temp_audio_file}"'
-            ]
-            
-            print(f"[CMD] Extracting audio with command: {' '.join(extract_cmd)}")
-            result = subprocess.run(' '.join(extract_cmd), shell=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
-            
-            # Verify the audio file was created successfully
-            if os.path.exists(temp_audio_file) and os.path.getsize(temp_audio_file) > 0:
-                print(f"[CMD] Successfully extracted audio to {temp_audio_file} (size: {os.path.getsize(temp_audio_file)} bytes)")
-            else:
-                print(f"[CMD] Failed to extract audio or audio file is empty")
-                
-                # Try alternative audio extraction methods
-                for method_name, cmd_args in [
-                    ("direct copy", ['-c:a', 'copy']),
-                    ("mp3 format", ['-c:a', 'libmp3lame', '-q:a', '4']),
-                    ("amr format", ['-c:a', 'libopencore_amrnb', '-ar', '8000', '-ab', '12.2k'])
-                ]:
-                    print(f"[CMD] Trying {method_name} audio extraction method")
-                    if "mp3" in method_name:
-                        alt_audio_file = os.path.splitext(temp_audio_file)[0] + ".mp3"
-                    elif "amr" in method_name:
-                        alt_audio_file = os.path.splitext(temp_audio_file)[0] + ".amr"
-                    else:
-                        alt_audio_file = temp_audio_file
-                        
-                    alt_cmd = [
-                        'ffmpeg', '-y',
-                        '-i', f'"{input_video_path}"',
-                        '-t', str(extract_duration_sec),
-                        '-vn'
-                    ] + cmd_args + [f'"{alt_audio_file}"']
-                    
-                    subprocess.run(' '.join(alt_cmd), shell=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
-                    
-                    if os.path.exists(alt_audio_file) and os.path.getsize(alt_audio_file) > 0:
-                        print(f"[CMD] Successfully extracted audio using {method_name}: {alt_audio_file}")
-                        temp_audio_file = alt_audio_file
-                        break
-                    else:
-                        print(f"[CMD] {method_name} extraction failed")
-                
-                if not os.path.exists(temp_audio_file) or os.path.getsize(temp_audio_file) == 0:
-                    print(f"[CMD] All audio extraction methods failed")
-                    temp_audio_file = None
         
-        # Step 2: Encode the frames to a video
-        # If we have audio, use a different approach that's more reliable
-        if temp_audio_file and os.path.exists(temp_audio_file) and os.path.getsize(temp_audio_file) > 0:
-            print(f"[CMD] Using two-pass encoding to preserve audio quality")
-            
-            # First create video without audio - using vsync 0 to preserve all frames
-            temp_video_file = os.path.join(output_folder, f"temp_video_{timestamp}.mp4")
-            video_cmd = [
-                'ffmpeg', '-y',
-                '-framerate', '16',
-                '-i', f'"{os.path.join(frames_dir, "frame_%06d.png")}"',
-                '-c:v', 'libx264',
-                '-fps_mode', 'passthrough',
-                '-profile:v', 'high',
-                '-level', '3.1',
-                '-preset', 'veryslow',
-                '-crf', '12',
-                '-pix_fmt', 'yuv420p',
-                '-an',
-                f'"{temp_video_file}"'
-            ]
-            
-            print(f"[CMD] Creating video without audio...")
-            subprocess.run(' '.join(video_cmd), shell=True)
-            
-            # Verify the video has the correct number of frames
-            verify_cap = cv2.VideoCapture(temp_video_file)
-            if verify_cap.isOpened():
-                temp_frames = int(verify_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                verify_cap.release()
-                
-                if temp_frames != num_frames:
-                    print(f"[CMD] Warning: Intermediate video has {temp_frames} frames, but expected {num_frames}")
-                    
-                    # Try again with an alternative method if frame count is incorrect
-                    alt_video_cmd = [
-                        'ffmpeg', '-y',
-                        '-r', '16',
-                        '-start_number', '0',
-                        '-i', f'"{os.path.join(frames_dir, "frame_%06d.png")}"',
-                        '-vframes', str(num_frames),
-                        '-c:v', 'libx264',
-                        '-fps_mode', 'passthrough',
-                        '-pix_fmt', 'yuv420p',
-                        '-an',
-                        f'"{temp_video_file}"'
-                    ]
-                    
-                    print(f"[CMD] Retrying with alternative encoding method...")
-                    subprocess.run(' '.join(alt_video_cmd), shell=True)
-            
-            # Then combine video and audio
-            final_cmd = [
-                'ffmpeg', '-y',
-                '-i', f'"{temp_video_file}"',
-                '-i', f'"{temp_audio_file}"',
-                '-c:v', 'copy',
-                '-c:a', 'aac',
-                '-b:a', '192k',
-                '-shortest',
-                f'"{reencoded_video}"'
-            ]
-            
-            print(f"[CMD] Combining video and audio...")
-            subprocess.run(' '.join(final_cmd), shell=True)
-            
-            # Clean up temporary video
-            if os.path.exists(temp_video_file):
-                try:
-                    os.remove(temp_video_file)
-                except Exception as e:
-                    print(f"[CMD] Warning: Could not remove temp video file: {e}")
-                
-        else:
-            # Standard encoding without audio - using vsync 0 to preserve all frames
-            print(f"[CMD] Encoding video without audio (no valid audio detected)")
-            video_cmd = [
-                'ffmpeg', '-y',
-                '-framerate', '16',
-                '-i', f'"{os.path.join(frames_dir, "frame_%06d.png")}"',
-                '-c:v', 'libx264',
-                '-fps_mode', 'passthrough',
-                '-vframes', str(num_frames),
-                '-profile:v', 'high',
-                '-level', '3.1',
-                '-preset', 'veryslow',
-                '-crf', '12',
-                '-pix_fmt', 'yuv420p',
-                '-an',
-                f'"{reencoded_video}"'
-            ]
-            
-            subprocess.run(' '.join(video_cmd), shell=True)
-        
-        # Verify the frame count and retry with different method if incorrect
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            verify_cap = cv2.VideoCapture(reencoded_video)
-            if verify_cap.isOpened():
-                output_frames = int(verify_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                output_fps = verify_cap.get(cv2.CAP_PROP_FPS)
-                verify_cap.release()
-                verify_cap = None
-                
-                print(f"[CMD] Re-encoded video has {output_frames} frames at {output_fps} FPS (target: {num_frames} frames at 16 FPS)")
-                
-                if output_frames == num_frames:
-                    print(f"[CMD] Frame count verified successfully")
-                    break
-                    
-                if attempt < max_attempts - 1:
-                    print(f"[CMD] Incorrect frame count ({output_frames} vs {num_frames}). Retrying with alternative method...")
-                    
-                    # Try more aggressive approach to force exact frame count
-                    retry_cmd = [
-                        'ffmpeg', '-y',
-                        '-r', '16',
-                        '-start_number', '0',
-                        '-i', f'"{os.path.join(frames_dir, "frame_%06d.png")}"',
-                        '-vframes', str(num_frames),
-                        '-c:v', 'libx264',
-                        '-fps_mode', 'passthrough',
-                        '-pix_fmt', 'yuv420p',
-                        f'"{reencoded_video}"'
-                    ]
-                    
-                    if temp_audio_file and os.path.exists(temp_audio_file) and os.path.getsize(temp_audio_file) > 0:
-                        # Include audio if available
-                        retry_cmd = [
-                            'ffmpeg', '-y',
-                            '-r', '16',
-                            '-start_number', '0',
-                            '-i', f'"{os.path.join(frames_dir, "frame_%06d.png")}"',
-                            '-i', f'"{temp_audio_file}"',
-                            '-vframes', str(num_frames),
-                            '-c:v', 'libx264',
-                            '-c:a', 'aac',
-                            '-b:a', '192k',
-                            '-fps_mode', 'passthrough',
-                            '-pix_fmt', 'yuv420p',
-                            f'"{reencoded_video}"'
-                        ]
-                    
-                    subprocess.run(' '.join(retry_cmd), shell=True)
-                else:
-                    print(f"[CMD] Warning: Could not achieve target frame count after {max_attempts} attempts")
-            else:
-                print(f"[CMD] Warning: Could not open re-encoded video for verification")
-                break
-        
-        # If after all retries we still don't have the right frame count, create a new version from scratch
-        final_verify_cap = cv2.VideoCapture(reencoded_video)
-        if final_verify_cap.isOpened():
-            final_frame_count = int(final_verify_cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            final_verify_cap.release()
-            
-            if final_frame_count != num_frames:
-                print(f"[CMD] Final verification failed: {final_frame_count} vs {num_frames}. Creating video directly from frames...")
-                
-                # Create a new video directly from the frames
-                # This is a last resort measure that's more reliable but may have lower quality
-                new_output = os.path.join(output_folder, f"reencoded_fixed_{timestamp}_{sanitized_name}{ext}")
-                
-                # Use OpenCV to create the video directly
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                out = cv2.VideoWriter(new_output, fourcc, 16, (target_width, target_height))
-                
-                if out.isOpened():
-                    for i in range(num_frames):
-                        frame_path = os.path.join(frames_dir, f"frame_{i:06d}.png")
-                        if os.path.exists(frame_path):
-                            frame = cv2.imread(frame_path)
-                            if frame is not None:
-                                out.write(frame)
-                    
-                    out.release()
-                    print(f"[CMD] Created direct video with {num_frames} frames: {new_output}")
-                    
-                    # If we have audio, add it to the new video
-                    if temp_audio_file and os.path.exists(temp_audio_file) and os.path.getsize(temp_audio_file) > 0:
-                        with_audio = add_audio_to_video(input_video_path, new_output, output_folder, temp_audio_file)
-                        if with_audio[0] != new_output:
-                            reencoded_video = with_audio[0]
-                            print(f"[CMD] Using new video with audio: {reencoded_video}")
-                        else:
-                            reencoded_video = new_output
-                    else:
-                        reencoded_video = new_output
-                else:
-                    print(f"[CMD] Could not create direct video - keeping original re-encoded version")
+        # Verify the frame count; the pipeline reads exactly num_frames frames from this file, so a
+        # short output is discarded and the original video is used instead
+        verify_cap = cv2.VideoCapture(reencoded_video)
+        output_frames = int(verify_cap.get(cv2.CAP_PROP_FRAME_COUNT)) if verify_cap.isOpened() else 0
+        verify_cap.release()
+        verify_cap = None
+        print(f"[CMD] Re-encoded video has {output_frames} frames (target: {num_frames} frames at 16 FPS)")
+        if output_frames != num_frames:
+            print(f"[CMD] Error: Could not achieve target frame count ({output_frames} vs {num_frames}), using the original video")
+            os.remove(reencoded_video)
+            return input_video_path
         
         # Verify if output video has audio
         has_output_audio = check_video_has_audio(reencoded_video)
@@ -502,49 +277,11 @@ def reencode_video_to_16fps(input_video_path, num_frames, target_width=None, tar
         return reencoded_video
     
     except Exception as e:
-        if cap is not None:
-            cap.release()
         if verify_cap is not None:
             verify_cap.release()
         print(f"[CMD] Error during video re-encoding: {e}")
         traceback.print_exc()
         return input_video_path
-    
-    finally:
-        # Clean up temporary frames and audio
-        try:
-            # Clean up frame files
-            if frames_dir and os.path.exists(frames_dir):
-                frame_files = [f for f in os.listdir(frames_dir) if f.startswith("frame_")]
-                for f in frame_files:
-                    try:
-                        os.remove(os.path.join(frames_dir, f))
-                    except Exception as e:
-                        print(f"[CMD] Warning: Could not remove frame file {f}: {e}")
-                        
-                # Try to remove the directory
-                try:
-                    os.rmdir(frames_dir)
-                except Exception as e:
-                    print(f"[CMD] Warning: Could not remove frames directory: {e}")
-            
-            # Clean up audio file
-            if temp_audio_file and os.path.exists(temp_audio_file):
-                try:
-                    os.remove(temp_audio_file)
-                except Exception as e:
-                    print(f"[CMD] Warning: Could not remove temp audio file: {e}")
-                    
-            # Clean up video file
-            if temp_video_file and os.path.exists(temp_video_file):
-                try:
-                    os.remove(temp_video_file)
-                except Exception as e:
-                    print(f"[CMD] Warning: Could not remove temp video file: {e}")
-                    
-        except Exception as e:
-            print(f"[CMD] Warning: Error during cleanup: {e}")
-            traceback.print_exc()
 
 def check_video_has_audio(video_path):
     """Check if a video file contains audio streams using multiple methods for better reliability."""